@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+from database import WordDatabase
+from markov_model import TransitionModel
+from memory_store import MemoryWordStore
+from sentence_generator import SentenceGenerator
+from storage import WordStore
+from text_processor import TextProcessor
+from word_generator import WordGenerator
+from word_scorer import WordScorer
+
+# The library modules headless jobs import, and what they must not pull in
+CORE_MODULES = ['database', 'memory_store', 'text_processor', 'sentence_generator', 'word_generator']
+SLOW_IMPORTS = ['tkinter', 'multiprocessing', 'concurrent.futures.process']
+
+def build_corpus(word_count: int, vocabulary_size: int, seed: int) -> str:
+    """Generate a deterministic synthetic corpus from WordGenerator words.
+    
+    Word frequencies follow a Zipf-like distribution and sentences are 5-15
+    words long, so the n-gram tables look roughly like those of real text.
+    """
+    vocabulary = list(dict.fromkeys(WordGenerator(seed).generate_multiple_words(vocabulary_size)))
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    words = rng.choices(vocabulary, weights, k=word_count)
+    
+    sentences = []
+    position = 0
+    while position < len(words):
+        length = rng.randint(5, 15)
+        sentences.append(' '.join(words[position:position + length]).capitalize() + '.')
+        position += length
+    return ' '.join(sentences)
+
+def time_calls(function: Callable, repeat: int) -> dict:
+    """Call a function several times and summarize the wall-clock latency."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+    }
+
+def bench_imports(modules: Optional[List[str]] = None) -> dict:
+    """Import modules (the core ones by default) in a fresh interpreter and report what python -X importtime measured."""
+    modules = modules or CORE_MODULES
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+                               capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return {
+        'modules': {module: round(cumulative.get(module, 0) / 1000, 3) for module in modules},
+        'total_ms': round(sum(cumulative.get(module, 0) for module in modules) / 1000, 3),
+        'slow_imports': [module for module in SLOW_IMPORTS if module in cumulative],
+    }
+
+def check_imports(max_ms: float) -> int:
+    """Fail if the core modules import slow dependencies or take longer than max_ms."""
+    results = bench_imports()
+    print(json.dumps(results, indent=2))
+    if results['slow_imports']:
+        print(f"Core modules import {', '.join(results['slow_imports'])}", file=sys.stderr)
+        return 1
+    if results['total_ms'] > max_ms:
+        print(f"Core modules took {results['total_ms']} ms to import (limit {max_ms} ms)", file=sys.stderr)
+        return 1
+    return 0
+
+def bench_learning(db: WordStore, corpus: str) -> dict:
+    """Measure TextProcessor.learn_from_text throughput."""
+    processor = TextProcessor(db)
+    started = time.perf_counter()
+    processor.learn_from_text(corpus)
+    elapsed = time.perf_counter() - started
+    tokens = len(processor.tokenize(corpus).words)
+    
+    # Resubmitting the same text is caught by its content hash
+    started = time.perf_counter()
+    processor.learn_from_text(corpus)
+    duplicate = time.perf_counter() - started
+    return {
+        'tokens': tokens,
+        'seconds': round(elapsed, 4),
+        'tokens_per_second': round(tokens / elapsed, 1),
+        'duplicate_ms': round(duplicate * 1000, 3),
+    }
+
+def bench_generation(db: WordStore, sentence_count: int) -> dict:
+    """Measure SentenceGenerator.generate_sentence throughput."""
+    generator = SentenceGenerator(db)
+    started = time.perf_counter()
+    generator.generate_sentence()  # Pays for loading the model
+    first_sentence = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for _ in range(sentence_count):
+        generator.generate_sentence()
+    elapsed = time.perf_counter() - started
+    return {
+        'sentences': sentence_count,
+        'first_sentence_ms': round(first_sentence * 1000, 3),
+        'seconds': round(elapsed, 4),
+        'sentences_per_second': round(sentence_count / elapsed, 1),
+    }
+
+def bench_batch_generation(db: WordStore, sentence_count: int) -> dict:
+    """Measure SentenceGenerator.iter_sentences throughput."""
+    generator = SentenceGenerator(db)
+    _ = generator.model  # Load the model outside the timed section
+    started = time.perf_counter()
+    for _ in generator.iter_sentences(sentence_count):
+        pass
+    elapsed = time.perf_counter() - started
+    return {
+        'sentences': sentence_count,
+        'seconds': round(elapsed, 4),
+        'sentences_per_second': round(sentence_count / elapsed, 1),
+    }
+
+def bench_analysis(db: WordStore, sentence_count: int) -> dict:
+    """Measure SentenceGenerator.analyze_sentences, with a cold and then a warm bigram cache."""
+    generator = SentenceGenerator(db)
+    sentences = generator.generate_multiple_sentences(sentence_count)
+    timings = {}
+    for run in ('cold', 'warm'):
+        started = time.perf_counter()
+        generator.analyze_sentences(sentences)
+        elapsed = time.perf_counter() - started
+        timings[f'{run}_seconds'] = round(elapsed, 4)
+        timings[f'{run}_sentences_per_second'] = round(sentence_count / elapsed, 1)
+    return {'sentences': sentence_count, **timings}
+
+def bench_snapshot(db: WordStore, path: str, repeat: int) -> dict:
+    """Compare building the model from SQLite with mapping a saved snapshot."""
+    model = TransitionModel.from_database(db, vocabulary=True)
+    model.save_snapshot(path)
+    return {
+        'bytes': os.path.getsize(path),
+        'from_database': time_calls(lambda: TransitionModel.from_database(db, vocabulary=True), repeat),
+        'from_snapshot': time_calls(lambda: TransitionModel.from_snapshot(path), repeat),
+    }
+
+def bench_scoring(db: WordStore, candidate_count: int, seed: int) -> dict:
+    """Measure WordScorer training and bulk scoring of generated candidates.
+    
+    The corpus words are the valid labels; random letter strings are added
+    as the invalid ones.
+    """
+    generator = WordGenerator(seed)
+    db.add_words_bulk(generator.generate_multiple_words(len(db.vocabulary), 'simple'), False)
+    scorer = WordScorer()
+    started = time.perf_counter()
+    scorer.learn_from_database(db)
+    training = time.perf_counter() - started
+    
+    candidates = generator.generate_multiple_words(candidate_count)
+    started = time.perf_counter()
+    plausible = scorer.filter_plausible(candidates)
+    elapsed = time.perf_counter() - started
+    return {
+        'labeled_words': len(scorer),
+        'training_ms': round(training * 1000, 3),
+        'candidates': candidate_count,
+        'plausible': len(plausible),
+        'seconds': round(elapsed, 4),
+        'candidates_per_second': round(candidate_count / elapsed, 1),
+    }
+
+def open_store(backend: str, directory: str) -> WordStore:
+    """Create an empty store of the given backend, keeping any files in directory."""
+    if backend == 'memory':
+        return MemoryWordStore()
+    return WordDatabase(os.path.join(directory, 'benchmark.db'))
+
+def bench_save(db: MemoryWordStore, path: str) -> dict:
+    """Time writing an in-memory store to a SQLite file and loading it back."""
+    start = time.perf_counter()
+    db.save(path)
+    saved = time.perf_counter()
+    MemoryWordStore.load(path).close()
+    loaded = time.perf_counter()
+    return {
+        'save_ms': round((saved - start) * 1000, 3),
+        'load_ms': round((loaded - saved) * 1000, 3),
+        'file_bytes': os.path.getsize(path),
+    }
+
+def run_benchmarks(args) -> dict:
+    """Run every benchmark against a fresh store of the chosen backend."""
+    corpus = build_corpus(args.words, args.vocabulary, args.seed)
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'parameters': {
+            'words': args.words,
+            'vocabulary': args.vocabulary,
+            'sentences': args.sentences,
+            'repeat': args.repeat,
+            'candidates': args.candidates,
+            'seed': args.seed,
+            'backend': args.backend,
+        },
+    }
+    
+    results['imports'] = bench_imports()
+    with tempfile.TemporaryDirectory() as directory:
+        with open_store(args.backend, directory) as db:
+            random.seed(args.seed)
+            results['learn_from_text'] = bench_learning(db, corpus)
+            results['generate_sentence'] = bench_generation(db, args.sentences)
+            results['iter_sentences'] = bench_batch_generation(db, args.sentences)
+            results['analyze_sentences'] = bench_analysis(db, args.sentences)
+            generator = SentenceGenerator(db)
+            results['get_available_start_words'] = time_calls(generator.get_available_start_words, args.repeat)
+            results['get_statistics'] = time_calls(db.get_statistics, args.repeat)
+            results['model_snapshot'] = bench_snapshot(db, os.path.join(directory, 'model.snapshot'), args.repeat)
+            if args.backend == 'memory':
+                results['save_to_sqlite'] = bench_save(db, os.path.join(directory, 'saved.db'))
+            # Last, since it adds invalid words to the database
+            results['word_scorer'] = bench_scoring(db, args.candidates, args.seed)
+    
+    return results
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser."""
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion, generation and statistics hot paths.")
+    parser.add_argument('--words', type=int, default=50000, help="corpus size in words (default: %(default)s)")
+    parser.add_argument('--vocabulary', type=int, default=2000, help="distinct words to draw from (default: %(default)s)")
+    parser.add_argument('--sentences', type=int, default=1000, help="sentences to generate (default: %(default)s)")
+    parser.add_argument('--candidates', type=int, default=100000,
+                        help="generated words for the scorer to filter (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=5, help="calls per latency measurement (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the corpus and sampling (default: %(default)s)")
+    parser.add_argument('--backend', choices=['sqlite', 'memory'], default='sqlite',
+                        help="storage backend to benchmark (default: %(default)s)")
+    parser.add_argument('--output', help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--check-imports', type=float, metavar='MAX_MS',
+                        help="only check that the core modules import within MAX_MS and without slow dependencies")
+    return parser
+
+def main(argv: List[str] = None) -> int:
+    """Run the benchmarks and print the results as JSON."""
+    args = build_parser().parse_args(argv)
+    if args.check_imports is not None:
+        return check_imports(args.check_imports)
+    results = run_benchmarks(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import os
+import sys
+from typing import Iterable, Iterator, List, Optional, Tuple
+from database import WordDatabase
+from text_processor import TextProcessor, iter_text_chunks
+
+def ngram_order(value: str) -> int:
+    """Argparse type for an n-gram order, which starts at bigrams."""
+    order = int(value)
+    if order < 2:
+        raise argparse.ArgumentTypeError(f"must be at least 2, got {order}")
+    return order
+
+def positive_int(value: str) -> int:
+    """Argparse type for a size that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def iter_input_paths(paths: Iterable[str]) -> Iterator[str]:
+    """Expand directories into the files under them; '-' stands for stdin."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+def iter_documents(paths: Iterable[str], chunk_size: int) -> Iterator[Iterator[str]]:
+    """Open each input in turn and stream its text in chunks."""
+    for path in iter_input_paths(paths):
+        if path == '-':
+            yield iter_text_chunks(sys.stdin, chunk_size)
+            continue
+        with open(path, encoding='utf-8', errors='replace') as stream:
+            yield iter_text_chunks(stream, chunk_size)
+
+def iter_sources(paths: Iterable[str]) -> Iterator[Tuple[Optional[str], str]]:
+    """Read each input whole, as (source, text) pairs.
+    
+    Stdin has no source, since every text piped in is a different document
+    rather than a new version of the last one.
+    """
+    for path in iter_input_paths(paths):
+        if path == '-':
+            yield None, sys.stdin.read()
+            continue
+        with open(path, encoding='utf-8', errors='replace') as stream:
+            yield os.path.abspath(path), stream.read()
+
+def report_progress(progress: dict):
+    """Print a one-line progress update to stderr."""
+    print(f"\r{progress['documents']:,} files, {progress['tokens']:,} words, "
+          f"{progress['tokens_per_second']:,.0f} words/s", end='', file=sys.stderr, flush=True)
+
+def ingest(args) -> int:
+    """Train the database from files, directories or stdin."""
+    # Checked up front, so a typo doesn't stop the run after learning part of the input
+    missing = [path for path in args.paths if path != '-' and not os.path.exists(path)]
+    if missing:
+        for path in missing:
+            print(f"No such file or directory: {path}", file=sys.stderr)
+        return 1
+    
+    if args.incremental:
+        with WordDatabase(args.db) as db:
+            results = TextProcessor(db, args.order).learn_from_sources(iter_sources(args.paths))
+        print(f"Learned {results['learned']:,} new or changed files, "
+              f"skipped {results['skipped']:,} already learned")
+        return 0
+    
+    with WordDatabase(args.db) as db:
+        processor = TextProcessor(db, args.order)
+        progress = None if args.quiet else report_progress
+        documents = iter_documents(args.paths, args.chunk_size)
+        if args.workers == 1:
+            results = processor.learn_from_documents(documents, args.batch_size, progress)
+        else:
+            results = processor.learn_from_documents_parallel(documents, args.workers, args.batch_size, progress)
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Learned {results['tokens']:,} words from {results['documents']:,} files "
+          f"in {results['elapsed']:.1f}s ({results['tokens_per_second']:,.0f} words/s)")
+    return 0
+
+def unlearn(args) -> int:
+    """Remove training texts and subtract what they taught."""
+    with WordDatabase(args.db) as db:
+        processor = TextProcessor(db, args.order)
+        text_ids = list(args.ids)
+        for source in args.source:
+            text_ids.extend(db.get_training_text_ids(os.path.abspath(source)))
+        removed = 0
+        for text_id in text_ids:
+            results = processor.unlearn_text(text_id)
+            if results['removed']:
+                removed += 1
+            else:
+                print(f"No training text with id {text_id}", file=sys.stderr)
+    print(f"Unlearned {removed:,} training texts")
+    return 0 if removed == len(text_ids) else 1
+
+def rebuild(args) -> int:
+    """Recount every sequence from the stored training texts."""
+    with WordDatabase(args.db) as db:
+        processor = TextProcessor(db, args.order)
+        progress = None if args.quiet else report_progress
+        results = processor.rebuild(args.workers, args.batch_size, progress, args.force)
+    if not results['rebuilt']:
+        print("Some counts were streamed in by ingest without --incremental and have no stored text "
+              "to recount them from. Rebuilding would delete them; pass --force to rebuild anyway.",
+              file=sys.stderr)
+        return 1
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Rebuilt from {results['documents']:,} training texts ({results['tokens']:,} words) "
+          f"in {results['elapsed']:.1f}s")
+    return 0
+
+def optimize(args) -> int:
+    """Refresh the query planner statistics of the database."""
+    with WordDatabase(args.db) as db:
+        db.optimize(args.full)
+    print("Database optimized")
+    return 0
+
+def serve(args) -> int:
+    """Serve sentence generation over HTTP."""
+    from server import run_server
+    run_server(args.db, args.host, args.port, args.workers, args.batch_window, args.snapshot)
+    return 0
+
+def export(args) -> int:
+    """Compile the learned sequences into a binary model snapshot."""
+    from markov_model import TransitionModel
+    with WordDatabase(args.db) as db:
+        model = TransitionModel.from_database(db, args.order, vocabulary=True)
+    model.save_snapshot(args.output)
+    print(f"Exported {len(model.vocabulary):,} valid words and {len(model):,} transitions to {args.output}")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser for all commands."""
+    parser = argparse.ArgumentParser(description="Headless tools for the AI word learning model.")
+    parser.add_argument('--db', default='word_learning.db', help="database file (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    ingest_parser = subparsers.add_parser('ingest', help="learn words and sequences from text files")
+    ingest_parser.add_argument('paths', nargs='+', help="files or directories to read, or - for stdin")
+    ingest_parser.add_argument('--order', type=ngram_order, default=3,
+                               help="longest n-gram to learn (default: %(default)s)")
+    ingest_parser.add_argument('--batch-size', type=positive_int, default=100000,
+                               help="words to count before each database write (default: %(default)s)")
+    ingest_parser.add_argument('--chunk-size', type=positive_int, default=1 << 20,
+                               help="characters to read at a time (default: %(default)s)")
+    ingest_parser.add_argument('--workers', type=int, default=1,
+                               help="worker processes for tokenizing and counting; 0 uses every core (default: %(default)s)")
+    ingest_parser.add_argument('--quiet', action='store_true', help="don't report progress")
+    ingest_parser.add_argument('--incremental', action='store_true',
+                               help="store each file as a training text and skip files learned before; "
+                                    "without this, files are not stored and rebuild can't recount them")
+    ingest_parser.set_defaults(handler=ingest)
+    
+    unlearn_parser = subparsers.add_parser('unlearn', help="remove training texts and what they taught")
+    unlearn_parser.add_argument('ids', nargs='*', type=int, help="training text ids")
+    unlearn_parser.add_argument('--source', action='append', default=[],
+                                help="also remove the texts ingested from this file (repeatable)")
+    unlearn_parser.add_argument('--order', type=ngram_order, default=3,
+                                help="n-gram order of texts stored before the order was recorded (default: %(default)s)")
+    unlearn_parser.set_defaults(handler=unlearn)
+    
+    rebuild_parser = subparsers.add_parser(
+        'rebuild', help="recount all sequences from the stored training texts",
+        description="Recount every sequence, n-gram and word occurrence from the stored training texts. "
+                    "Refuses to run if some counts were streamed in by ingest without --incremental, "
+                    "since those have no stored text and would be lost. The old counts are deleted "
+                    "first, so until it finishes the database holds partial counts; if it is "
+                    "interrupted, run it again.")
+    rebuild_parser.add_argument('--order', type=ngram_order, default=3,
+                                help="longest n-gram to learn (default: %(default)s)")
+    rebuild_parser.add_argument('--batch-size', type=positive_int, default=100000,
+                                help="words to count before each database write (default: %(default)s)")
+    rebuild_parser.add_argument('--workers', type=int, default=1,
+                                help="worker processes for tokenizing and counting; 0 uses every core (default: %(default)s)")
+    rebuild_parser.add_argument('--quiet', action='store_true', help="don't report progress")
+    rebuild_parser.add_argument('--force', action='store_true',
+                                help="rebuild even if that deletes counts streamed in without stored texts")
+    rebuild_parser.set_defaults(handler=rebuild)
+    
+    optimize_parser = subparsers.add_parser('optimize', help="refresh query planner statistics")
+    optimize_parser.add_argument('--full', action='store_true', help="run a full ANALYZE and VACUUM")
+    optimize_parser.set_defaults(handler=optimize)
+    
+    serve_parser = subparsers.add_parser('serve', help="serve sentence generation over HTTP/JSON")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: %(default)s)")
+    serve_parser.add_argument('--port', type=int, default=8080, help="port to listen on (default: %(default)s)")
+    serve_parser.add_argument('--workers', type=int, default=4, help="generation threads (default: %(default)s)")
+    serve_parser.add_argument('--batch-window', type=float, default=0.002,
+                              help="seconds to wait for more requests to batch together (default: %(default)s)")
+    serve_parser.add_argument('--snapshot', help="serve the model from a snapshot made by the export command")
+    serve_parser.set_defaults(handler=serve)
+    
+    export_parser = subparsers.add_parser('export', help="write the model to a memory-mappable snapshot")
+    export_parser.add_argument('output', help="snapshot file to write")
+    export_parser.add_argument('--order', type=ngram_order, help="longest n-gram to include (default: all)")
+    export_parser.set_defaults(handler=export)
+    
+    return parser
+
+def main(argv: List[str] = None) -> int:
+    """Run the command line interface."""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,69 +1,507 @@
+import hashlib
 import sqlite3
-import os
-from typing import List, Tuple, Optional
+import threading
+import weakref
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+from storage import (COUNT_FLAGS, INCOMPLETE_OCCURRENCES, LABEL_GENERATION, LABEL_REVISION, UNTRACKED_COUNTS,
+                     WordStore, count_words, lowercase_counts)
 
-class WordDatabase:
+# Applied to every connection when it is opened
+CONNECTION_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -65536',  # 64 MB page cache
+    'PRAGMA mmap_size = 268435456',  # 256 MB
+    'PRAGMA temp_store = MEMORY',
+    # INSERT OR REPLACE only fires the delete triggers that keep statistics right with this on
+    'PRAGMA recursive_triggers = ON',
+]
+
+# Training texts longer than this many UTF-8 bytes are stored zlib-compressed
+COMPRESSION_THRESHOLD = 4096
+
+def content_hash(text: str) -> str:
+    """Get the SHA-256 hex digest that identifies a training text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _encode_training_text(text: str) -> Tuple[object, int]:
+    """Get the stored form of a training text and whether it is compressed."""
+    data = text.encode('utf-8')
+    if len(data) > COMPRESSION_THRESHOLD:
+        return zlib.compress(data), 1
+    return text, 0
+
+def _decode_training_text(content, compressed: int) -> str:
+    """Turn a stored training text back into a string."""
+    return zlib.decompress(content).decode('utf-8') if compressed else content
+
+def _create_tables(cursor: sqlite3.Cursor):
+    """Schema version 1: the original tables."""
+    # Create words table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS words (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word TEXT UNIQUE NOT NULL,
+            is_valid INTEGER NOT NULL,
+            learned_from TEXT DEFAULT 'guessing',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create word_sequences table for Markov chain
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS word_sequences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word1 TEXT NOT NULL,
+            word2 TEXT NOT NULL,
+            frequency INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create training_texts table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS training_texts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text_content TEXT NOT NULL,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _unique_word_sequences(cursor: sqlite3.Cursor):
+    """Schema version 2: one row per (word1, word2) pair."""
+    # Fold the frequencies of duplicate pairs into the oldest row
+    cursor.execute('''
+        UPDATE word_sequences SET frequency = (
+            SELECT SUM(dup.frequency) FROM word_sequences AS dup
+            WHERE dup.word1 = word_sequences.word1 AND dup.word2 = word_sequences.word2
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM word_sequences
+            GROUP BY word1, word2 HAVING COUNT(*) > 1
+        )
+    ''')
+    cursor.execute('''
+        DELETE FROM word_sequences WHERE id NOT IN (
+            SELECT MIN(id) FROM word_sequences GROUP BY word1, word2
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_word_sequences_pair
+        ON word_sequences (word1, word2)
+    ''')
+
+def _create_word_ngrams(cursor: sqlite3.Cursor):
+    """Schema version 3: higher-order n-grams keyed on their preceding words."""
+    # context holds the n - 1 preceding words separated by single spaces
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS word_ngrams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            n INTEGER NOT NULL,
+            context TEXT NOT NULL,
+            word TEXT NOT NULL,
+            frequency INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_word_ngrams_context
+        ON word_ngrams (n, context, word)
+    ''')
+
+def _create_statistics(cursor: sqlite3.Cursor):
+    """Schema version 4: row counts kept up to date by triggers."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS statistics (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO statistics (name, value)
+        SELECT 'total_words', COUNT(*) FROM words
+        UNION ALL SELECT 'valid_words', COUNT(*) FROM words WHERE is_valid = 1
+        UNION ALL SELECT 'invalid_words', COUNT(*) FROM words WHERE is_valid = 0
+        UNION ALL SELECT 'training_texts', COUNT(*) FROM training_texts
+        UNION ALL SELECT 'word_sequences', COUNT(*) FROM word_sequences
+        UNION ALL SELECT 'word_ngrams', COUNT(*) FROM word_ngrams
+    ''')
+    
+    # Word counts follow inserts, deletes and validity changes
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_statistics_insert AFTER INSERT ON words
+        BEGIN
+            UPDATE statistics SET value = value + CASE name
+                WHEN 'total_words' THEN 1
+                WHEN 'valid_words' THEN NEW.is_valid = 1
+                ELSE NEW.is_valid = 0 END
+            WHERE name IN ('total_words', 'valid_words', 'invalid_words');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_statistics_delete AFTER DELETE ON words
+        BEGIN
+            UPDATE statistics SET value = value - CASE name
+                WHEN 'total_words' THEN 1
+                WHEN 'valid_words' THEN OLD.is_valid = 1
+                ELSE OLD.is_valid = 0 END
+            WHERE name IN ('total_words', 'valid_words', 'invalid_words');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_statistics_update AFTER UPDATE OF is_valid ON words
+        BEGIN
+            UPDATE statistics SET value = value + CASE name
+                WHEN 'valid_words' THEN (NEW.is_valid = 1) - (OLD.is_valid = 1)
+                ELSE (NEW.is_valid = 0) - (OLD.is_valid = 0) END
+            WHERE name IN ('valid_words', 'invalid_words');
+        END
+    ''')
+    
+    # The other tables only need their row counts
+    for table in ('training_texts', 'word_sequences', 'word_ngrams'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_statistics_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE statistics SET value = value + 1 WHERE name = '{table}';
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_statistics_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE statistics SET value = value - 1 WHERE name = '{table}';
+            END
+        ''')
+
+def _create_lookup_indexes(cursor: sqlite3.Cursor):
+    """Schema version 5: indexes for the hot lookups."""
+    # Covers get_word_sequences: seek on word1, rows already in frequency order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_word_sequences_successors
+        ON word_sequences (word1, frequency DESC, word2)
+    ''')
+    # Covers get_valid_words without reading the invalid rows
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_words_valid
+        ON words (word) WHERE is_valid = 1
+    ''')
+    # Lets get_all_words walk the rows in creation order instead of sorting
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_words_created_at
+        ON words (created_at)
+    ''')
+    cursor.execute('ANALYZE')
+
+def _hash_training_texts(cursor: sqlite3.Cursor):
+    """Schema version 6: content hashes, sources and compression for training texts."""
+    cursor.execute('ALTER TABLE training_texts ADD COLUMN content_hash TEXT')
+    cursor.execute('ALTER TABLE training_texts ADD COLUMN source TEXT')
+    cursor.execute('ALTER TABLE training_texts ADD COLUMN compressed INTEGER NOT NULL DEFAULT 0')
+    rows = cursor.execute('SELECT id, text_content FROM training_texts').fetchall()
+    cursor.executemany(
+        'UPDATE training_texts SET content_hash = ?, text_content = ?, compressed = ? WHERE id = ?',
+        [(content_hash(text), *_encode_training_text(text), text_id) for text_id, text in rows])
+    
+    # Resubmissions were already counted; keep the first copy of each text
+    cursor.execute('''
+        DELETE FROM training_texts
+        WHERE id NOT IN (SELECT MIN(id) FROM training_texts GROUP BY content_hash)
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_training_texts_hash
+        ON training_texts (content_hash)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_training_texts_source
+        ON training_texts (source)
+    ''')
+
+def _tokenize_training_texts(cursor: sqlite3.Cursor) -> Iterator[List[str]]:
+    """Yield the words of every stored training text, for migrations that recount them."""
+    # Imported here so that opening an up to date database never loads the tokenizer
+    from text_processor import Tokenizer
+    tokenizer = Tokenizer()
+    for content, compressed in cursor.connection.execute('SELECT text_content, compressed FROM training_texts'):
+        yield tokenizer.tokenize(_decode_training_text(content, compressed)).words
+
+def _count_word_occurrences(cursor: sqlite3.Cursor):
+    """Schema version 7: how often each word has been seen in training texts."""
+    cursor.execute('ALTER TABLE words ADD COLUMN occurrences INTEGER NOT NULL DEFAULT 0')
+    # Unlearning deletes words that drop to zero, so start from what the stored texts contain
+    occurrences = Counter()
+    for words in _tokenize_training_texts(cursor):
+        occurrences.update(words)
+    cursor.executemany('UPDATE words SET occurrences = ? WHERE word = ?',
+                       ((count, word) for word, count in occurrences.items()))
+    # Serves top-K queries (walked backwards) and occurrence ranges
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_words_occurrences
+        ON words (occurrences, word)
+    ''')
+
+def _create_metadata(cursor: sqlite3.Cursor):
+    """Schema version 8: flags about how the stored counts were learned."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metadata (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Sequences seen more often than the stored texts explain were streamed in by ingest
+    recounted = Counter()
+    for words in _tokenize_training_texts(cursor):
+        recounted.update(zip(words, words[1:]))
+    cursor.execute('SELECT word1, word2, frequency FROM word_sequences')
+    untracked = any(frequency > recounted[(word1, word2)] for word1, word2, frequency in cursor)
+    cursor.execute('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)', (UNTRACKED_COUNTS, int(untracked)))
+    # Streamed words were not counted before version 7, so their occurrences can't be trusted either
+    cursor.execute('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)',
+                   (INCOMPLETE_OCCURRENCES, int(untracked)))
+
+def _record_ngram_order(cursor: sqlite3.Cursor):
+    """Schema version 9: the n-gram order each training text was learned with."""
+    # Unknown (NULL) for texts learned before; unlearning those falls back to the caller's order
+    cursor.execute('ALTER TABLE training_texts ADD COLUMN ngram_order INTEGER')
+
+def _track_label_changes(cursor: sqlite3.Cursor):
+    """Schema version 10: a label revision bumped whenever a word is added or relabeled."""
+    cursor.execute('ALTER TABLE words ADD COLUMN label_revision INTEGER NOT NULL DEFAULT 0')
+    # Existing words keep their id order
+    cursor.execute('UPDATE words SET label_revision = id')
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO metadata (name, value)
+        SELECT '{LABEL_REVISION}', COALESCE(MAX(label_revision), 0) FROM words
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_words_label_revision
+        ON words (label_revision)
+    ''')
+    
+    # New rows take the next revision unless one is given, as import_rows does
+    bump = f'''
+        BEGIN
+            UPDATE metadata SET value = value + 1 WHERE name = '{LABEL_REVISION}';
+            UPDATE words SET label_revision = (SELECT value FROM metadata WHERE name = '{LABEL_REVISION}')
+            WHERE id = NEW.id;
+        END
+    '''
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_label_insert AFTER INSERT ON words
+        WHEN NEW.label_revision = 0
+    ''' + bump)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS words_label_update AFTER UPDATE OF is_valid ON words
+        WHEN OLD.is_valid IS NOT NEW.is_valid
+    ''' + bump)
+
+# Schema migrations in order; PRAGMA user_version holds how many have been applied
+MIGRATIONS = [
+    _create_tables,
+    _unique_word_sequences,
+    _create_word_ngrams,
+    _create_statistics,
+    _create_lookup_indexes,
+    _hash_training_texts,
+    _count_word_occurrences,
+    _create_metadata,
+    _record_ngram_order,
+    _track_label_changes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def _bump_label_generation(cursor: sqlite3.Cursor):
+    """Tell learners following the label revisions that words were deleted."""
+    cursor.execute('INSERT OR IGNORE INTO metadata (name, value) VALUES (?, 0)', (LABEL_GENERATION,))
+    cursor.execute('UPDATE metadata SET value = value + 1 WHERE name = ?', (LABEL_GENERATION,))
+
+def _write_words(cursor: sqlite3.Cursor, words: Dict[str, int], is_valid: bool, learned_from: str,
+                 relabel: bool = True):
+    """Upsert lowercase words, adding their occurrences and, with relabel, setting their label."""
+    label = 'is_valid = excluded.is_valid, learned_from = excluded.learned_from,' if relabel else ''
+    cursor.executemany(f'''
+        INSERT INTO words (word, is_valid, learned_from, occurrences)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(word) DO UPDATE SET
+        {label}
+        occurrences = occurrences + excluded.occurrences
+    ''', ((word, 1 if is_valid else 0, learned_from, count) for word, count in words.items()))
+
+def _write_sequences(cursor: sqlite3.Cursor, sequences: Dict[Tuple[str, ...], int]):
+    """Add lowercase (word1, word2) counts to word_sequences."""
+    cursor.executemany('''
+        INSERT INTO word_sequences (word1, word2, frequency)
+        VALUES (?, ?, ?)
+        ON CONFLICT(word1, word2) DO UPDATE SET
+        frequency = frequency + excluded.frequency
+    ''', ((word1, word2, count) for (word1, word2), count in sequences.items()))
+
+def _write_ngrams(cursor: sqlite3.Cursor, ngrams: Dict[Tuple[str, ...], int]):
+    """Add lowercase n-gram counts of order 3 or higher to word_ngrams."""
+    cursor.executemany('''
+        INSERT INTO word_ngrams (n, context, word, frequency)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(n, context, word) DO UPDATE SET
+        frequency = frequency + excluded.frequency
+    ''', ((len(ngram), ' '.join(ngram[:-1]), ngram[-1], count) for ngram, count in ngrams.items()))
+
+def _write_training_text(cursor: sqlite3.Cursor, text: str, source: Optional[str],
+                         ngram_order: Optional[int]) -> bool:
+    """Store a training text unless one with the same content is stored; True if it was stored."""
+    content, compressed = _encode_training_text(text)
+    cursor.execute('''
+        INSERT INTO training_texts (text_content, content_hash, source, compressed, ngram_order)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(content_hash) DO NOTHING
+    ''', (content, content_hash(text), source, compressed, ngram_order))
+    return cursor.rowcount == 1
+
+class _ThreadConnection:
+    """One thread's connection, closed once the thread's local state is dropped as it exits."""
+    
+    __slots__ = ('conn', '__weakref__')
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        weakref.finalize(self, conn.close)
+
+class WordDatabase(WordStore):
     def __init__(self, db_path: str = "word_learning.db"):
         """Initialize the database connection and create tables if they don't exist."""
+        super().__init__()
         self.db_path = db_path
+        self._local = threading.local()
+        # Only weakly held, so a thread's connection closes when the thread exits
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        holder = getattr(self._local, 'connection', None)
+        if holder is None:
+            # close() may run on another thread, so allow cross-thread use
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            holder = _ThreadConnection(conn)
+            self._local.connection = holder
+            with self._connections_lock:
+                self._connections.add(holder)
+        return holder.conn
+    
+    def close(self):
+        """Close every connection opened by this database object that is still open."""
+        with self._connections_lock:
+            connections = [holder.conn for holder in self._connections]
+            self._connections = weakref.WeakSet()
+            # Threads still holding the old local state reconnect on next use
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                # Refresh planner statistics that have gone stale, as SQLite recommends on close
+                conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            conn.close()
+    
     def init_database(self):
-        """Create the database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Create words table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS words (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    word TEXT UNIQUE NOT NULL,
-                    is_valid INTEGER NOT NULL,
-                    learned_from TEXT DEFAULT 'guessing',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create word_sequences table for Markov chain
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS word_sequences (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    word1 TEXT NOT NULL,
-                    word2 TEXT NOT NULL,
-                    frequency INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create training_texts table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS training_texts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    text_content TEXT NOT NULL,
-                    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
+        """Create the database tables and apply any pending schema migrations."""
+        conn = self._connect()
+        # An up to date database needs no write lock, so opening one stays cheap
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
+        while True:
+            with conn:
+                # Take the write lock first so concurrent processes migrate one at a time
+                conn.execute('BEGIN IMMEDIATE')
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version >= SCHEMA_VERSION:
+                    break
+                MIGRATIONS[version](conn.cursor())
+                conn.execute(f'PRAGMA user_version = {version + 1}')
     
     def add_word(self, word: str, is_valid: bool, learned_from: str = 'guessing') -> bool:
         """Add a word to the database or update if it exists."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                # Upsert in place, keeping the row's id, creation time and occurrences
                 cursor.execute('''
-                    INSERT OR REPLACE INTO words (word, is_valid, learned_from)
+                    INSERT INTO words (word, is_valid, learned_from)
                     VALUES (?, ?, ?)
+                    ON CONFLICT(word) DO UPDATE SET
+                    is_valid = excluded.is_valid,
+                    learned_from = excluded.learned_from
                 ''', (word.lower(), 1 if is_valid else 0, learned_from))
                 conn.commit()
-                return True
+            self._update_vocabulary([word.lower()], is_valid)
+            return True
         except Exception as e:
             print(f"Error adding word: {e}")
             return False
     
+    def add_words_bulk(self, words: Iterable[str], is_valid: bool = True,
+                       learned_from: str = 'guessing', relabel: bool = True) -> bool:
+        """Add or update many words in a single transaction.
+        
+        If ``words`` is a dict such as a ``Counter``, its values are added to
+        the words' occurrence counts. With ``relabel`` False, words already
+        stored keep their label and only gain occurrences.
+        """
+        # Duplicates collapse to one row anyway, so only write each word once
+        unique_words = count_words(words)
+        try:
+            with self._connect() as conn:
+                _write_words(conn.cursor(), unique_words, is_valid, learned_from, relabel)
+                conn.commit()
+            self._update_labels(unique_words, is_valid, relabel)
+            return True
+        except Exception as e:
+            print(f"Error adding words: {e}")
+            return False
+    
+    def _update_labels(self, words: Iterable[str], is_valid: bool, relabel: bool):
+        """Apply upserted words to the vocabulary cache."""
+        if relabel:
+            self._update_vocabulary(words, is_valid)
+        else:
+            # Only the words that were new got the label, so reload rather than guess which
+            self._invalidate_vocabulary()
+    
+    def add_counts(self, word_counts: Dict[str, int], ngram_counts: Dict[int, Dict[Tuple[str, ...], int]],
+                   relabel: bool = True, text: Optional[str] = None, source: Optional[str] = None,
+                   ngram_order: Optional[int] = None) -> bool:
+        """Add the word and n-gram counts learned from text in one transaction.
+        
+        With ``text``, the training text is stored in the same transaction,
+        so a text is never stored without its counts. Errors are raised, not
+        printed, and roll everything back.
+        """
+        words = count_words(word_counts)
+        sequences = lowercase_counts(ngram_counts.get(2, {}))
+        higher_order = {}
+        for n, counts in ngram_counts.items():
+            if n > 2:
+                higher_order.update(lowercase_counts(counts))
+        with self._connect() as conn:
+            # Take the write lock before checking for the text, so no other writer can store it in between
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+            if text is not None and not _write_training_text(cursor, text, source, ngram_order):
+                return False
+            _write_words(cursor, words, True, 'text_learning', relabel)
+            _write_sequences(cursor, sequences)
+            _write_ngrams(cursor, higher_order)
+        self.sequence_revision += 1
+        self._update_labels(words, True, relabel)
+        self._update_sources(word1 for word1, _ in sequences)
+        return True
+    
     def get_word(self, word: str) -> Optional[Tuple[str, bool, str]]:
         """Get word information from database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT word, is_valid, learned_from FROM words WHERE word = ?', (word.lower(),))
             result = cursor.fetchone()
@@ -73,22 +511,64 @@ class WordDatabase:
     
     def get_all_words(self) -> List[Tuple[str, bool, str]]:
         """Get all words from the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT word, is_valid, learned_from FROM words ORDER BY created_at DESC')
             return [(row[0], bool(row[1]), row[2]) for row in cursor.fetchall()]
     
+    def get_top_words(self, k: int = 10, valid_only: bool = True) -> List[Tuple[str, int]]:
+        """Get the k words seen most often in training texts, as (word, occurrences)."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT word, occurrences FROM words
+                WHERE occurrences > 0 {'AND is_valid = 1' if valid_only else ''}
+                ORDER BY occurrences DESC, word DESC
+                LIMIT ?
+            ''', (k,))
+            return cursor.fetchall()
+    
+    def get_words_by_occurrences(self, min_occurrences: int, max_occurrences: Optional[int] = None,
+                                 limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Get the words seen between min and max times (inclusive), most frequent first."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT word, occurrences FROM words
+                WHERE occurrences BETWEEN ? AND ?
+                ORDER BY occurrences DESC, word DESC
+                LIMIT ?
+            ''', (min_occurrences, max_occurrences if max_occurrences is not None else 2 ** 63 - 1,
+                  limit if limit is not None else -1))
+            return cursor.fetchall()
+    
     def get_valid_words(self) -> List[str]:
         """Get all valid words from the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT word FROM words WHERE is_valid = 1')
+            # Once ANALYZE sees mostly valid words the planner prefers scanning the
+            # table, which reads every row; the partial index is never slower
+            cursor.execute('SELECT word FROM words INDEXED BY idx_words_valid WHERE is_valid = 1')
             return [row[0] for row in cursor.fetchall()]
     
+    def iter_label_changes(self, last_revision: int = 0) -> Iterator[Tuple[int, str, bool]]:
+        """Yield (label revision, word, is_valid) for the words added or relabeled after last_revision.
+        
+        Adding a word or changing its is_valid gives it the next revision, so
+        callers can remember the last revision they saw and fetch just the
+        labels that changed since, in order, each word once.
+        """
+        with self._connect() as conn:
+            for revision, word, is_valid in conn.execute('''
+                SELECT label_revision, word, is_valid FROM words
+                WHERE label_revision > ? ORDER BY label_revision
+            ''', (last_revision,)):
+                yield revision, word, bool(is_valid)
+    
     def add_word_sequence(self, word1: str, word2: str) -> bool:
         """Add or update a word sequence for Markov chain."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO word_sequences (word1, word2, frequency)
@@ -97,14 +577,34 @@ class WordDatabase:
                     frequency = frequency + 1
                 ''', (word1.lower(), word2.lower()))
                 conn.commit()
-                return True
+            self.sequence_revision += 1
+            self._update_sources([word1.lower()])
+            return True
         except Exception as e:
             print(f"Error adding word sequence: {e}")
             return False
     
+    def add_word_sequences_bulk(self, sequences: Dict[Tuple[str, str], int]) -> bool:
+        """Add or update many word sequences in a single transaction.
+        
+        ``sequences`` maps (word1, word2) pairs to the number of times they
+        were seen, e.g. a ``Counter`` built while processing a text.
+        """
+        counts = lowercase_counts(sequences)
+        try:
+            with self._connect() as conn:
+                _write_sequences(conn.cursor(), counts)
+                conn.commit()
+            self.sequence_revision += 1
+            self._update_sources(word1 for word1, _ in counts)
+            return True
+        except Exception as e:
+            print(f"Error adding word sequences: {e}")
+            return False
+    
     def get_word_sequences(self, word: str) -> List[Tuple[str, int]]:
         """Get all sequences starting with a given word."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT word2, frequency FROM word_sequences 
@@ -112,56 +612,352 @@ class WordDatabase:
             ''', (word.lower(),))
             return cursor.fetchall()
     
-    def add_training_text(self, text: str) -> bool:
-        """Add a training text to the database."""
+    def get_sequence_frequencies(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Look up the frequencies of many (word1, word2) pairs at once.
+        
+        Pairs that have never been seen are left out of the result.
+        """
+        pairs = list(dict.fromkeys((word1.lower(), word2.lower()) for word1, word2 in pairs))
+        frequencies = {}
+        with self._connect() as conn:
+            # Stay well under SQLite's limit on bound parameters
+            for start in range(0, len(pairs), 400):
+                chunk = pairs[start:start + 400]
+                cursor = conn.execute(f'''
+                    WITH pairs (word1, word2) AS (VALUES {', '.join(['(?, ?)'] * len(chunk))})
+                    SELECT word1, word2, frequency
+                    FROM pairs JOIN word_sequences USING (word1, word2)
+                ''', [word for pair in chunk for word in pair])
+                for word1, word2, frequency in cursor:
+                    frequencies[(word1, word2)] = frequency
+        return frequencies
+    
+    def add_ngrams_bulk(self, ngrams: Dict[Tuple[str, ...], int]) -> bool:
+        """Add or update many n-grams of order 3 or higher in a single transaction.
+        
+        ``ngrams`` maps word tuples to the number of times they were seen; the
+        last word is the one that followed the others.
+        """
+        counts = lowercase_counts(ngrams)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('INSERT INTO training_texts (text_content) VALUES (?)', (text,))
+            with self._connect() as conn:
+                _write_ngrams(conn.cursor(), counts)
                 conn.commit()
-                return True
+            self.sequence_revision += 1
+            return True
+        except Exception as e:
+            print(f"Error adding n-grams: {e}")
+            return False
+    
+    def get_max_ngram_order(self) -> int:
+        """Get the highest n-gram order stored, at least 2 (the bigrams)."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(n) FROM word_ngrams')
+            return max(cursor.fetchone()[0] or 2, 2)
+    
+    def iter_ngrams(self, n: int, ordered: bool = False) -> Iterator[Tuple[Tuple[str, ...], int]]:
+        """Iterate over every stored n-gram of order n as (words, frequency).
+        
+        With ordered, rows come sorted by words straight off the unique
+        indexes, so nothing is sorted in memory.
+        """
+        cursor = self._connect().cursor()
+        if n == 2:
+            cursor.execute('SELECT word1, word2, frequency FROM word_sequences'
+                           + (' ORDER BY word1, word2' if ordered else ''))
+            for word1, word2, frequency in cursor:
+                yield (word1, word2), frequency
+            return
+        # Words never contain spaces or anything below them, so context order is word order
+        cursor.execute('SELECT context, word, frequency FROM word_ngrams WHERE n = ?'
+                       + (' ORDER BY n, context, word' if ordered else ''), (n,))
+        for context, word, frequency in cursor:
+            yield (*context.split(' '), word), frequency
+    
+    def _get_source_words(self) -> List[str]:
+        """Get every word that has at least one stored successor."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT DISTINCT word1 FROM word_sequences')
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_start_words(self) -> List[str]:
+        """Get the valid words that have at least one stored successor."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT word FROM words
+                WHERE is_valid = 1 AND EXISTS (
+                    SELECT 1 FROM word_sequences WHERE word_sequences.word1 = words.word
+                )
+            ''')
+            return [row[0] for row in cursor.fetchall()]
+    
+    
+    def iter_word_sequences(self) -> Iterator[Tuple[str, str, int]]:
+        """Iterate over every stored (word1, word2, frequency) sequence."""
+        cursor = self._connect().cursor()
+        cursor.execute('SELECT word1, word2, frequency FROM word_sequences')
+        yield from cursor
+    
+    def add_training_text(self, text: str, source: Optional[str] = None,
+                          ngram_order: Optional[int] = None) -> bool:
+        """Add a training text to the database, with the n-gram order it is learned with.
+        
+        Returns False if the same text is already stored, so it is never
+        learned twice.
+        """
+        try:
+            with self._connect() as conn:
+                stored = _write_training_text(conn.cursor(), text, source, ngram_order)
+                conn.commit()
+                return stored
         except Exception as e:
             print(f"Error adding training text: {e}")
             return False
     
+    def has_training_text(self, text: str) -> bool:
+        """Check whether a training text is already stored, by its content hash."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM training_texts WHERE content_hash = ?', (content_hash(text),))
+            return cursor.fetchone() is not None
+    
+    def get_training_text(self, text_id: int) -> Optional[str]:
+        """Get a stored training text by id."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT text_content, compressed FROM training_texts WHERE id = ?', (text_id,))
+            row = cursor.fetchone()
+            return _decode_training_text(*row) if row else None
+    
+    def get_training_text_order(self, text_id: int) -> Optional[int]:
+        """Get the n-gram order a stored training text was learned with, if known."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT ngram_order FROM training_texts WHERE id = ?', (text_id,)).fetchone()
+            return row[0] if row else None
+    
+    def set_training_text_orders(self, ngram_order: int):
+        """Record that every stored training text is now learned with the given n-gram order."""
+        with self._connect() as conn:
+            conn.execute('UPDATE training_texts SET ngram_order = ?', (ngram_order,))
+            conn.commit()
+    
+    def iter_training_texts(self, page_size: int = 100) -> Iterator[Tuple[int, Optional[str], str]]:
+        """Iterate over every stored (id, source, text) training text, oldest first.
+        
+        Texts are fetched a page at a time, so no read stays open while the
+        caller writes what it learned from them.
+        """
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute('''
+                    SELECT id, source, text_content, compressed FROM training_texts
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, page_size)).fetchall()
+            if not rows:
+                return
+            for text_id, source, content, compressed in rows:
+                yield text_id, source, _decode_training_text(content, compressed)
+            last_id = rows[-1][0]
+    
+    def get_training_text_ids(self, source: str) -> List[int]:
+        """Get the ids of the training texts stored for a source, oldest first."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM training_texts WHERE source = ? ORDER BY id', (source,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def subtract_training_text(self, text_id: int, word_counts: Dict[str, int],
+                               ngram_counts: Dict[int, Dict[Tuple[str, ...], int]]) -> bool:
+        """Delete a training text and subtract its counts in one transaction.
+        
+        ``word_counts`` and ``ngram_counts`` (by order) are what the text
+        contributed. Sequences and n-grams whose frequency drops to zero are
+        deleted, as are words learned from text that are no longer seen,
+        unless the occurrence counts are flagged as incomplete.
+        """
+        bigrams = ngram_counts.get(2, {})
+        higher_order = [(n, ' '.join(ngram[:-1]), ngram[-1], count)
+                        for n, counts in ngram_counts.items() if n > 2
+                        for ngram, count in counts.items()]
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE word_sequences SET frequency = frequency - ?
+                    WHERE word1 = ? AND word2 = ?
+                ''', ((count, word1, word2) for (word1, word2), count in bigrams.items()))
+                cursor.executemany('''
+                    DELETE FROM word_sequences
+                    WHERE word1 = ? AND word2 = ? AND frequency <= 0
+                ''', bigrams.keys())
+                cursor.executemany('''
+                    UPDATE word_ngrams SET frequency = frequency - ?
+                    WHERE n = ? AND context = ? AND word = ?
+                ''', ((count, n, context, word) for n, context, word, count in higher_order))
+                cursor.executemany('''
+                    DELETE FROM word_ngrams
+                    WHERE n = ? AND context = ? AND word = ? AND frequency <= 0
+                ''', ((n, context, word) for n, context, word, _ in higher_order))
+                cursor.executemany('''
+                    UPDATE words SET occurrences = MAX(occurrences - ?, 0)
+                    WHERE word = ?
+                ''', ((count, word) for word, count in word_counts.items()))
+                forgotten = []
+                incomplete = cursor.execute('SELECT value FROM metadata WHERE name = ?',
+                                            (INCOMPLETE_OCCURRENCES,)).fetchone()
+                if not (incomplete and incomplete[0]):
+                    forgotten = [word for word in word_counts
+                                 if cursor.execute('''
+                                     DELETE FROM words
+                                     WHERE word = ? AND occurrences = 0 AND learned_from = 'text_learning'
+                                 ''', (word,)).rowcount]
+                    if forgotten:
+                        _bump_label_generation(cursor)
+                cursor.execute('DELETE FROM training_texts WHERE id = ?', (text_id,))
+                
+                # Words left without any successor stop being start words
+                orphaned = [word1 for word1 in {word1 for word1, _ in bigrams}
+                            if cursor.execute('SELECT 1 FROM word_sequences WHERE word1 = ? LIMIT 1',
+                                              (word1,)).fetchone() is None]
+                conn.commit()
+            self.sequence_revision += 1
+            self._remove_sources(orphaned)
+            self._update_vocabulary(forgotten, False)
+            return True
+        except Exception as e:
+            print(f"Error subtracting training text: {e}")
+            return False
+    
+    def get_metadata(self, name: str) -> int:
+        """Get a flag or counter kept about the stored data, 0 if it was never set."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT value FROM metadata WHERE name = ?', (name,)).fetchone()
+            return row[0] if row else 0
+    
+    def set_metadata(self, name: str, value: int) -> bool:
+        """Set a flag or counter kept about the stored data."""
+        try:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)', (name, value))
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error setting metadata: {e}")
+            return False
+    
     def get_statistics(self) -> dict:
         """Get learning statistics."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Total words
-            cursor.execute('SELECT COUNT(*) FROM words')
-            total_words = cursor.fetchone()[0]
-            
-            # Valid words
-            cursor.execute('SELECT COUNT(*) FROM words WHERE is_valid = 1')
-            valid_words = cursor.fetchone()[0]
-            
-            # Invalid words
-            cursor.execute('SELECT COUNT(*) FROM words WHERE is_valid = 0')
-            invalid_words = cursor.fetchone()[0]
-            
-            # Training texts
-            cursor.execute('SELECT COUNT(*) FROM training_texts')
-            training_texts = cursor.fetchone()[0]
-            
-            # Word sequences
-            cursor.execute('SELECT COUNT(*) FROM word_sequences')
-            word_sequences = cursor.fetchone()[0]
-            
-            return {
-                'total_words': total_words,
-                'valid_words': valid_words,
-                'invalid_words': invalid_words,
-                'training_texts': training_texts,
-                'word_sequences': word_sequences
-            }
+        # The counts are maintained by triggers, so this never scans the tables
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, value FROM statistics')
+            return dict(cursor.fetchall())
+    
+    def optimize(self, full: bool = False):
+        """Refresh the query planner statistics; ``full`` re-analyzes every index and vacuums."""
+        conn = self._connect()
+        if full:
+            conn.execute('ANALYZE')
+            conn.execute('VACUUM')
+        else:
+            conn.execute('PRAGMA optimize')
+    
+    def clear_counts(self):
+        """Delete every learned sequence, n-gram and word occurrence count.
+        
+        The words themselves and the training texts are kept. Flags about how
+        the counts were learned go with them.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE words SET occurrences = 0 WHERE occurrences != 0')
+            cursor.execute('DELETE FROM word_sequences')
+            cursor.execute('DELETE FROM word_ngrams')
+            cursor.executemany('DELETE FROM metadata WHERE name = ?', ((name,) for name in COUNT_FLAGS))
+            conn.commit()
+        self.sequence_revision += 1
+        self._reset_vocabulary(sources_only=True)
     
     def clear_database(self):
         """Clear all data from the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM words')
             cursor.execute('DELETE FROM word_sequences')
+            cursor.execute('DELETE FROM word_ngrams')
             cursor.execute('DELETE FROM training_texts')
+            cursor.executemany('DELETE FROM metadata WHERE name = ?', ((name,) for name in COUNT_FLAGS))
+            _bump_label_generation(cursor)
             conn.commit()
+        self.sequence_revision += 1
+        self._reset_vocabulary()
+    
+    def export_rows(self) -> Dict[str, list]:
+        """Get every stored row, in the format import_rows takes."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            rows = {
+                'words': cursor.execute('''
+                    SELECT id, word, is_valid, learned_from, created_at, occurrences, label_revision
+                    FROM words ORDER BY id
+                ''').fetchall(),
+                'word_sequences': cursor.execute('SELECT word1, word2, frequency FROM word_sequences').fetchall(),
+                'word_ngrams': cursor.execute('SELECT n, context, word, frequency FROM word_ngrams').fetchall(),
+            }
+            cursor.execute('''
+                SELECT id, source, text_content, compressed, processed_at, ngram_order
+                FROM training_texts ORDER BY id
+            ''')
+            rows['training_texts'] = [(text_id, source, _decode_training_text(content, compressed),
+                                       processed_at, ngram_order)
+                                      for text_id, source, content, compressed, processed_at, ngram_order in cursor]
+            rows['metadata'] = cursor.execute('SELECT name, value FROM metadata').fetchall()
+            return rows
+    
+    def import_rows(self, rows: Dict[str, list]) -> bool:
+        """Replace everything in the database with rows from export_rows, in one transaction."""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                row = cursor.execute('SELECT value FROM metadata WHERE name = ?', (LABEL_GENERATION,)).fetchone()
+                generation = max(row[0] if row else 0, dict(rows['metadata']).get(LABEL_GENERATION, 0))
+                for table in ('words', 'word_sequences', 'word_ngrams', 'training_texts', 'metadata'):
+                    cursor.execute(f'DELETE FROM {table}')
+                cursor.executemany('''
+                    INSERT INTO words (id, word, is_valid, learned_from, created_at, occurrences, label_revision)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows['words'])
+                cursor.executemany('''
+                    INSERT INTO word_sequences (word1, word2, frequency)
+                    VALUES (?, ?, ?)
+                ''', rows['word_sequences'])
+                cursor.executemany('''
+                    INSERT INTO word_ngrams (n, context, word, frequency)
+                    VALUES (?, ?, ?, ?)
+                ''', rows['word_ngrams'])
+                cursor.executemany('''
+                    INSERT INTO training_texts (id, text_content, compressed, content_hash, source, processed_at,
+                                                ngram_order)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', ((text_id, *_encode_training_text(text), content_hash(text), source, processed_at, ngram_order)
+                      for text_id, source, text, processed_at, ngram_order in rows['training_texts']))
+                cursor.executemany('INSERT INTO metadata (name, value) VALUES (?, ?)', rows['metadata'])
+                # The next word added must get a revision past every imported one
+                cursor.execute('''
+                    INSERT OR IGNORE INTO metadata (name, value)
+                    SELECT ?, COALESCE(MAX(label_revision), 0) FROM words
+                ''', (LABEL_REVISION,))
+                # Past both generations, so learners of either copy start over
+                cursor.execute('INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)',
+                               (LABEL_GENERATION, generation + 1))
+                conn.commit()
+            self.sequence_revision += 1
+            self._invalidate_vocabulary()
+            return True
+        except Exception as e:
+            print(f"Error importing rows: {e}")
+            return False
@@ -1,8 +1,13 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+import sys
 import threading
+try:
+    import tkinter as tk
+    from tkinter import ttk, scrolledtext, messagebox
+except ImportError:  # Headless Python builds ship without tkinter
+    tk = None
 from database import WordDatabase
 from word_generator import WordGenerator
+from word_scorer import WordScorer
 from text_processor import TextProcessor
 from sentence_generator import SentenceGenerator
 
@@ -17,6 +22,7 @@ class AIWordLearningApp:
         # Initialize components
         self.db = WordDatabase()
         self.word_generator = WordGenerator()
+        self.word_scorer = WordScorer()
         self.text_processor = TextProcessor(self.db)
         self.sentence_generator = SentenceGenerator(self.db)
         
@@ -209,7 +215,14 @@ class AIWordLearningApp:
     
     def generate_new_word(self):
         """Generate a new random word for guessing."""
-        self.current_word = self.word_generator.generate_realistic_word()
+        # Pick up newly labeled words, then avoid proposing known ones again
+        self.word_generator.learn_from_database(self.db)
+        self.word_scorer.learn_from_database(self.db)
+        candidates = [self.word_generator.generate_learned_word(exclude=self.db.vocabulary) for _ in range(50)]
+        
+        # Show the most plausible candidate
+        plausible = self.word_scorer.filter_plausible(candidates)
+        self.current_word = plausible[0] if plausible else candidates[0]
         self.word_display.config(text=self.current_word)
         self.guessing_status.config(text="Is this a real word? Click T for True or F for False")
     
@@ -256,6 +269,10 @@ class AIWordLearningApp:
     
     def display_learning_results(self, results):
         """Display the results of text learning."""
+        if results['duplicate']:
+            self.learning_status.config(text="This text was already learned, so it was skipped.")
+            return
+        
         self.learning_status.config(text="Text processed successfully!")
         
         results_text = (f"Words learned: {results['words_learned']}\n"
@@ -324,9 +341,20 @@ Ready for sentence generation: {'Yes' if stats['word_sequences'] > 0 else 'No'}
 
 def main():
     """Main function to run the application."""
-    root = tk.Tk()
-    app = AIWordLearningApp(root)
-    root.mainloop()
+    # Command line arguments, or no GUI toolkit or display, mean the headless tools
+    if tk is not None and len(sys.argv) == 1:
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            # Such as no $DISPLAY over SSH
+            print(f"Can't open a window ({e}); running the command line tools instead", file=sys.stderr)
+        else:
+            app = AIWordLearningApp(root)
+            root.mainloop()
+            app.db.close()
+            return 0
+    import cli
+    return cli.main()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
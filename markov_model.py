@@ -0,0 +1,426 @@
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+# Snapshot layout: a header, a table of sections, then the 8-byte aligned
+# arrays themselves in native byte order
+SNAPSHOT_MAGIC = b'WLMS'
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('<4sHBxI')
+_SNAPSHOT_SECTION = struct.Struct('<QQc7x')
+_BYTE_ORDERS = {'little': 0, 'big': 1}
+
+def _intern_rows(rows: Iterable[Tuple[Tuple[str, ...], int]],
+                 word_ids: Mapping[str, int]) -> Iterator[Tuple[Tuple[int, ...], int]]:
+    """Map (words tuple, frequency) rows sorted by words to id tuples, dropping unseen n-grams."""
+    # Ids follow word order, so the id tuples stay sorted as NgramTable.build needs
+    previous = ()
+    for ngram, frequency in rows:
+        if frequency <= 0:
+            continue
+        ids = tuple(map(word_ids.__getitem__, ngram))
+        if ids < previous:
+            raise ValueError("N-gram rows must be sorted by their words")
+        previous = ids
+        yield ids, frequency
+
+class StringTable:
+    """Sorted words packed into one UTF-8 buffer, indexed by id.
+    
+    Looking a word up bisects the sorted entries, so nothing has to be
+    decoded or hashed when the table is loaded.
+    """
+    
+    def __init__(self, data: memoryview, offsets: Sequence[int]):
+        """Initialize the table from the packed bytes and the len + 1 entry offsets."""
+        self.data = data
+        self.offsets = offsets
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, word_id: int) -> str:
+        return str(self.data[self.offsets[word_id]:self.offsets[word_id + 1]], 'utf-8')
+    
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+    
+    def get(self, word: str, default=None) -> Optional[int]:
+        """Get the id of a word, or ``default`` if it isn't in the table."""
+        key = word.encode('utf-8')
+        data, offsets = self.data, self.offsets
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(data[offsets[middle]:offsets[middle + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(offsets) - 1 and data[offsets[low]:offsets[low + 1]] == key:
+            return low
+        return default
+
+class NgramTable:
+    """Successor lists for every context of one length, stored as a prefix trie.
+    
+    The first context word indexes ``offsets[0]`` directly. Each further
+    context word is found by bisecting the sorted child ids in ``keys``, and
+    the last level points into ``targets`` and ``cumulative``, which hold the
+    successors and their running frequency totals.
+    """
+    
+    def __init__(self, context_length: int, offsets: List[array], keys: List[array],
+                 targets: array, cumulative: array):
+        """Initialize the table from already built arrays."""
+        self.context_length = context_length
+        self.offsets = offsets
+        self.keys = keys
+        self.targets = targets
+        self.cumulative = cumulative
+    
+    @classmethod
+    def build(cls, context_length: int, vocabulary_size: int,
+              ngrams: Iterable[Tuple[Tuple[int, ...], int]]) -> 'NgramTable':
+        """Build a table from (id tuple, frequency) rows sorted by id tuple."""
+        first_counts = [0] * (vocabulary_size + 1)
+        keys = [array('i') for _ in range(context_length - 1)]
+        offsets = [array('q')] + [array('q') for _ in range(context_length - 1)]
+        targets = array('i')
+        cumulative = array('q')
+        
+        previous_context = None
+        running_total = 0
+        for ngram, frequency in ngrams:
+            context = ngram[:-1]
+            if context != previous_context:
+                # Open trie nodes from the first level where the context changed
+                changed = 0
+                if previous_context is not None:
+                    while context[changed] == previous_context[changed]:
+                        changed += 1
+                for level in range(max(changed, 1), context_length):
+                    if level == 1:
+                        first_counts[context[0] + 1] += 1
+                    keys[level - 1].append(context[level])
+                    next_level = keys[level] if level < context_length - 1 else targets
+                    offsets[level].append(len(next_level))
+                previous_context = context
+                running_total = 0
+            if context_length == 1:
+                first_counts[context[0] + 1] += 1
+            running_total += frequency
+            targets.append(ngram[-1])
+            cumulative.append(running_total)
+        
+        # Close the last node of every level and turn first-word counts into offsets
+        for level in range(1, context_length):
+            next_level = keys[level] if level < context_length - 1 else targets
+            offsets[level].append(len(next_level))
+        for i in range(1, len(first_counts)):
+            first_counts[i] += first_counts[i - 1]
+        offsets[0] = array('q', first_counts)
+        
+        return cls(context_length, offsets, keys, targets, cumulative)
+    
+    def __len__(self) -> int:
+        """Number of stored (context, successor) pairs."""
+        return len(self.targets)
+    
+    def successors(self, context: Sequence[int]) -> Tuple[int, int]:
+        """Get the [start, end) range of the context's successors."""
+        first_offsets = self.offsets[0]
+        first = context[0]
+        if first + 1 >= len(first_offsets):
+            return 0, 0
+        start, end = first_offsets[first], first_offsets[first + 1]
+        for level in range(1, self.context_length):
+            level_keys = self.keys[level - 1]
+            node = bisect_left(level_keys, context[level], start, end)
+            if node == end or level_keys[node] != context[level]:
+                return 0, 0
+            start, end = self.offsets[level][node], self.offsets[level][node + 1]
+        return start, end
+    
+    def frequency(self, context: Sequence[int], target: int) -> int:
+        """Get how often the target followed the context, 0 if never."""
+        start, end = self.successors(context)
+        # Successors are sorted by id within their range
+        index = bisect_left(self.targets, target, start, end)
+        if index == end or self.targets[index] != target:
+            return 0
+        return self.cumulative[index] - (self.cumulative[index - 1] if index > start else 0)
+    
+    def pick(self, start: int, end: int, point: float) -> int:
+        """Map a uniform point in [0, 1) to a successor id in a non-empty range."""
+        target = point * self.cumulative[end - 1]
+        index = min(bisect_right(self.cumulative, target, start, end), end - 1)
+        return self.targets[index]
+    
+    def sample(self, context: Sequence[int], rng=random) -> Optional[int]:
+        """Sample a successor id of the context, weighted by frequency."""
+        start, end = self.successors(context)
+        if start == end:
+            return None
+        return self.pick(start, end, rng.random())
+
+class ModelVocabulary:
+    """The valid words carried by a model, read in place from sorted id arrays.
+    
+    Answers the same questions as the database's Vocabulary, so a generator
+    serving a snapshot needs nothing from the database.
+    """
+    
+    def __init__(self, words: Sequence[str], word_ids: Mapping[str, int],
+                 valid_ids: Sequence[int], start_ids: Sequence[int]):
+        """Initialize the vocabulary from the model's words and the ids of the valid and start words."""
+        self.words = words
+        self.word_ids = word_ids
+        self.valid_ids = valid_ids
+        self.start_ids = start_ids
+        self.start_word_count = len(start_ids)
+    
+    def __len__(self) -> int:
+        return len(self.valid_ids)
+    
+    def __contains__(self, word: str) -> bool:
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            return False
+        index = bisect_left(self.valid_ids, word_id)
+        return index < len(self.valid_ids) and self.valid_ids[index] == word_id
+    
+    def random_word(self, rng=random) -> Optional[str]:
+        """Pick a uniformly random valid word, or None if there are none."""
+        if not self.valid_ids:
+            return None
+        return self.words[self.valid_ids[rng.randrange(len(self.valid_ids))]]
+    
+    def start_words(self) -> List[str]:
+        """Get the valid words that have at least one successor."""
+        return [self.words[word_id] for word_id in self.start_ids]
+
+class TransitionModel:
+    """In-memory n-gram Markov model built once from the database.
+    
+    Words are interned to integer ids and each order has its own NgramTable.
+    Sampling uses the longest context that has been seen and backs off to
+    shorter ones, down to plain bigrams. A model built with the valid words
+    also carries them as a ModelVocabulary in ``vocabulary``.
+    """
+    
+    def __init__(self, words: Sequence[str], tables: Dict[int, NgramTable],
+                 word_ids: Optional[Mapping[str, int]] = None, valid_ids: Optional[Sequence[int]] = None,
+                 start_ids: Optional[Sequence[int]] = None):
+        """Initialize the model from interned words, per-order tables and the sorted ids of the valid words."""
+        self.words = words
+        if word_ids is None:
+            word_ids = {word: word_id for word_id, word in enumerate(words)}
+        self.word_ids = word_ids
+        self.tables = tables
+        self.orders = sorted(tables, reverse=True)
+        self.max_order = self.orders[0] if self.orders else 2
+        self.vocabulary = None
+        if valid_ids is not None:
+            if start_ids is None:
+                start_ids = array('i', [word_id for word_id in valid_ids if self.successor_count(word_id)])
+            self.vocabulary = ModelVocabulary(words, word_ids, valid_ids, start_ids)
+    
+    @classmethod
+    def from_ngrams(cls, ngrams_by_order: Dict[int, Iterable[Tuple[Tuple[str, ...], int]]]) -> 'TransitionModel':
+        """Build a model from {order: [(words tuple, frequency), ...]}."""
+        rows_by_order = {
+            order: sorted((ngram, frequency) for ngram, frequency in ngrams if frequency > 0)
+            for order, ngrams in ngrams_by_order.items()
+        }
+        return cls.from_sorted_ngrams(rows_by_order, rows_by_order.__getitem__)
+    
+    @classmethod
+    def from_sorted_ngrams(cls, orders: Iterable[int],
+                           iter_ngrams: Callable[[int], Iterable[Tuple[Tuple[str, ...], int]]],
+                           valid_words: Optional[Iterable[str]] = None) -> 'TransitionModel':
+        """Build a model from the rows of each order, read twice and sorted by words.
+        
+        The first pass only interns the words, so the second can stream the
+        rows straight into the tables without holding them in memory. With
+        ``valid_words``, the model also carries them as its vocabulary.
+        """
+        orders = list(orders)
+        words = set()
+        for order in orders:
+            for ngram, frequency in iter_ngrams(order):
+                if frequency > 0:
+                    words.update(ngram)
+        if valid_words is not None:
+            valid_words = set(valid_words)
+            words.update(valid_words)
+        words = sorted(words)
+        word_ids = {word: word_id for word_id, word in enumerate(words)}
+        
+        tables = {}
+        for order in orders:
+            table = NgramTable.build(order - 1, len(words), _intern_rows(iter_ngrams(order), word_ids))
+            if len(table):
+                tables[order] = table
+        
+        valid_ids = None
+        if valid_words is not None:
+            valid_ids = array('i', sorted(word_ids[word] for word in valid_words))
+        return cls(words, tables, word_ids, valid_ids)
+    
+    @classmethod
+    def from_sequences(cls, sequences: Iterable[Tuple[str, str, int]]) -> 'TransitionModel':
+        """Build a bigram-only model from (word1, word2, frequency) rows."""
+        return cls.from_ngrams({2: (((word1, word2), frequency) for word1, word2, frequency in sequences)})
+    
+    @classmethod
+    def from_database(cls, database, max_order: Optional[int] = None,
+                      vocabulary: bool = False) -> 'TransitionModel':
+        """Build a model from everything stored in a WordDatabase, and its valid words if ``vocabulary``."""
+        if max_order is None:
+            max_order = database.get_max_ngram_order()
+        return cls.from_sorted_ngrams(range(2, max_order + 1),
+                                      lambda order: database.iter_ngrams(order, ordered=True),
+                                      database.get_valid_words() if vocabulary else None)
+    
+    @classmethod
+    def from_snapshot(cls, path: str) -> 'TransitionModel':
+        """Memory-map a snapshot written by save_snapshot.
+        
+        The arrays are used in place, so loading costs the same whatever the
+        model size, and processes loading the same file share its pages.
+        """
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+        magic, version, byte_order, section_count = _SNAPSHOT_HEADER.unpack_from(view)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} model snapshot")
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+        
+        sections = []
+        for index in range(section_count):
+            offset, length, typecode = _SNAPSHOT_SECTION.unpack_from(
+                view, _SNAPSHOT_HEADER.size + index * _SNAPSHOT_SECTION.size)
+            typecode = typecode.decode('ascii')
+            itemsize = array(typecode).itemsize
+            sections.append(view[offset:offset + length * itemsize].cast(typecode))
+        sections = iter(sections)
+        
+        word_offsets = next(sections)
+        words = StringTable(next(sections), word_offsets)
+        tables = {}
+        for order in next(sections):
+            context_length = order - 1
+            offsets = [next(sections) for _ in range(context_length)]
+            keys = [next(sections) for _ in range(context_length - 1)]
+            tables[order] = NgramTable(context_length, offsets, keys, next(sections), next(sections))
+        # Models saved with their valid words end with the valid and start word ids
+        vocabulary = list(sections)
+        if vocabulary:
+            valid_ids, start_ids = vocabulary
+            return cls(words, tables, words, valid_ids, start_ids)
+        return cls(words, tables, words)
+    
+    def save_snapshot(self, path: str):
+        """Write the model to a binary snapshot that from_snapshot can map.
+        
+        The snapshot holds the sorted string table of the words, then the trie
+        offsets, keys, successors and cumulative weights of every order, then
+        the sorted ids of the valid and start words if the model has them.
+        """
+        # The string table is searched by bisection, so the ids must follow word order
+        if any(self.words[i] >= self.words[i + 1] for i in range(len(self.words) - 1)):
+            raise ValueError("Snapshots need a model whose word ids are in sorted word order")
+        
+        encoded = [word.encode('utf-8') for word in self.words]
+        word_offsets = array('q', [0])
+        for word in encoded:
+            word_offsets.append(word_offsets[-1] + len(word))
+        sections = [array('q', word_offsets), array('B', b''.join(encoded)), array('i', sorted(self.tables))]
+        for order in sorted(self.tables):
+            table = self.tables[order]
+            sections.extend(array('q', level) for level in table.offsets)
+            sections.extend(array('i', level) for level in table.keys)
+            sections.append(array('i', table.targets))
+            sections.append(array('q', table.cumulative))
+        if self.vocabulary is not None:
+            sections.append(array('i', self.vocabulary.valid_ids))
+            sections.append(array('i', self.vocabulary.start_ids))
+        
+        position = _SNAPSHOT_HEADER.size + len(sections) * _SNAPSHOT_SECTION.size
+        entries = []
+        for section in sections:
+            position = (position + 7) & ~7
+            entries.append(_SNAPSHOT_SECTION.pack(position, len(section), section.typecode.encode('ascii')))
+            position += len(section) * section.itemsize
+        
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                             _BYTE_ORDERS[sys.byteorder], len(sections)))
+            file.write(b''.join(entries))
+            for section in sections:
+                file.write(b'\0' * (-file.tell() % 8))
+                section.tofile(file)
+        os.replace(temporary_path, path)
+    
+    def __len__(self) -> int:
+        """Number of stored transitions across all orders."""
+        return sum(len(table) for table in self.tables.values())
+    
+    def word_id(self, word: str) -> Optional[int]:
+        """Get the interned id of a word, or None if it has no transitions."""
+        return self.word_ids.get(word)
+    
+    def frequency(self, ngram: Sequence[str]) -> int:
+        """Get how often the last word of an n-gram followed the others, 0 if never."""
+        table = self.tables.get(len(ngram))
+        ids = [self.word_ids.get(word) for word in ngram]
+        if table is None or None in ids:
+            return 0
+        return table.frequency(ids[:-1], ids[-1])
+    
+    def successor_count(self, word_id: int) -> int:
+        """Number of distinct words seen directly after the given word."""
+        table = self.tables.get(2)
+        if table is None:
+            return 0
+        start, end = table.successors((word_id,))
+        return end - start
+    
+    def next_word_id(self, history: Sequence[Optional[int]], rng=random) -> Optional[int]:
+        """Sample the id of the next word given the ids of the words so far.
+        
+        ``None`` entries stand for words the model does not know.
+        """
+        return self.choose_next_id(history, rng.random())
+    
+    def choose_next_id(self, history: Sequence[Optional[int]], point: float) -> Optional[int]:
+        """Like next_word_id, but with the uniform random number in [0, 1) supplied.
+        
+        This lets callers draw the random numbers for many sentences at once.
+        """
+        for order in self.orders:
+            context_length = order - 1
+            if len(history) < context_length:
+                continue
+            context = history[len(history) - context_length:]
+            if None in context:
+                continue
+            table = self.tables[order]
+            start, end = table.successors(context)
+            if start != end:
+                return table.pick(start, end, point)
+        return None
+    
+    def next_word(self, history: Sequence[str], rng=random) -> Optional[str]:
+        """Sample the word following ``history``, or None if nothing follows it."""
+        context = [self.word_ids.get(word) for word in history[-(self.max_order - 1):]]
+        next_id = self.next_word_id(context, rng)
+        return None if next_id is None else self.words[next_id]
@@ -0,0 +1,487 @@
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from database import WordDatabase, content_hash
+from storage import (COUNT_FLAGS, INCOMPLETE_OCCURRENCES, LABEL_GENERATION, LABEL_REVISION, WordStore, count_words,
+                     lowercase_counts)
+
+def _timestamp() -> str:
+    """The current UTC time, formatted like SQLite's CURRENT_TIMESTAMP."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+class MemoryWordStore(WordStore):
+    """Keeps words, sequences, n-grams and training texts in memory.
+    
+    Behaves like WordDatabase without touching the disk, for tests and
+    short-lived workers. Words live in a dict keyed by word, with their label
+    revisions packed into an array so iter_label_changes can bisect to where
+    its caller left off. Sequences are nested dicts keyed by the first word, so a
+    word's successors are one lookup away. ``save`` writes everything to a
+    SQLite database and ``load`` reads one back.
+    """
+    
+    def __init__(self):
+        """Initialize an empty store."""
+        super().__init__()
+        self._lock = threading.RLock()
+        self._metadata: Dict[str, int] = {}
+        self._reset()
+    
+    def _reset(self):
+        """Forget everything stored."""
+        # word -> [id, is_valid, learned_from, created_at, occurrences, label_revision]
+        self._words: Dict[str, list] = {}
+        # Label revisions in order, with the word each was given to; relabeled and
+        # deleted words leave stale slots behind
+        self._revisions = array('q')
+        self._revision_words: List[str] = []
+        self._next_word_id = 1
+        # Kept up to date like the database's statistics table, so get_statistics never scans
+        self._valid_word_count = 0
+        # word1 -> {word2: frequency}
+        self._successors: Dict[str, Dict[str, int]] = {}
+        self._sequence_count = 0
+        # n -> {(word, ..., word): frequency}
+        self._ngrams: Dict[int, Dict[Tuple[str, ...], int]] = {}
+        self._ngram_count = 0
+        # id -> [source, text, content hash, processed_at, ngram_order]
+        self._texts: Dict[int, list] = {}
+        self._text_hashes: Dict[str, int] = {}
+        self._next_text_id = 1
+    
+    def close(self):
+        """Nothing to release; kept for the WordStore interface."""
+    
+    def _mark_label_change(self, word: str, row: list, revision: Optional[int] = None):
+        """Give a word the next label revision, unless one is passed."""
+        if revision is None:
+            revision = self._metadata.get(LABEL_REVISION, 0) + 1
+        self._metadata[LABEL_REVISION] = max(self._metadata.get(LABEL_REVISION, 0), revision)
+        row[5] = revision
+        self._revisions.append(revision)
+        self._revision_words.append(word)
+    
+    def _insert_word(self, word: str, is_valid: bool, learned_from: str, occurrences: int = 0,
+                     word_id: Optional[int] = None, created_at: Optional[str] = None,
+                     label_revision: Optional[int] = None):
+        """Add a new word row, giving it the next id and label revision unless they are passed."""
+        if word_id is None:
+            word_id = self._next_word_id
+        self._next_word_id = max(self._next_word_id, word_id + 1)
+        row = [word_id, bool(is_valid), learned_from, created_at or _timestamp(), occurrences, 0]
+        self._words[word] = row
+        self._valid_word_count += row[1]
+        self._mark_label_change(word, row, label_revision)
+    
+    def _upsert_words(self, words: Dict[str, int], is_valid: bool, learned_from: str,
+                      relabel: bool = True) -> List[str]:
+        """Add or relabel words, adding their occurrence counts; returns the words given the label."""
+        labeled = []
+        with self._lock:
+            for word, count in words.items():
+                row = self._words.get(word)
+                if row is None:
+                    self._insert_word(word, is_valid, learned_from, count)
+                    labeled.append(word)
+                    continue
+                if relabel:
+                    if row[1] != is_valid:
+                        self._mark_label_change(word, row)
+                        self._valid_word_count += 1 if is_valid else -1
+                    row[1] = is_valid
+                    row[2] = learned_from
+                    labeled.append(word)
+                row[4] += count
+        return labeled
+    
+    def add_word(self, word: str, is_valid: bool, learned_from: str = 'guessing') -> bool:
+        """Add a word or update its label."""
+        self._upsert_words({word.lower(): 0}, is_valid, learned_from)
+        self._update_vocabulary([word.lower()], is_valid)
+        return True
+    
+    def add_words_bulk(self, words: Iterable[str], is_valid: bool = True,
+                       learned_from: str = 'guessing', relabel: bool = True) -> bool:
+        """Add or update many words; a dict of counts also adds occurrences.
+        
+        With ``relabel`` False, words already stored keep their label.
+        """
+        labeled = self._upsert_words(count_words(words), is_valid, learned_from, relabel)
+        self._update_vocabulary(labeled, is_valid)
+        return True
+    
+    def add_counts(self, word_counts: Dict[str, int], ngram_counts: Dict[int, Dict[Tuple[str, ...], int]],
+                   relabel: bool = True, text: Optional[str] = None, source: Optional[str] = None,
+                   ngram_order: Optional[int] = None) -> bool:
+        """Add the word and n-gram counts learned from text, and the text itself if given."""
+        sequences = lowercase_counts(ngram_counts.get(2, {}))
+        with self._lock:
+            if text is not None and not self.add_training_text(text, source, ngram_order):
+                return False
+            labeled = self._upsert_words(count_words(word_counts), True, 'text_learning', relabel)
+            self._add_sequences(sequences)
+            for n, counts in ngram_counts.items():
+                if n > 2:
+                    self._add_ngrams(lowercase_counts(counts))
+        # The vocabulary lock is never taken while holding the store's
+        self._update_vocabulary(labeled, True)
+        self._update_sources(word1 for word1, _ in sequences)
+        return True
+    
+    def get_word(self, word: str) -> Optional[Tuple[str, bool, str]]:
+        """Get (word, is_valid, learned_from) for a word, or None."""
+        row = self._words.get(word.lower())
+        if row is None:
+            return None
+        return word.lower(), row[1], row[2]
+    
+    def get_all_words(self) -> List[Tuple[str, bool, str]]:
+        """Get every word as (word, is_valid, learned_from), newest first."""
+        with self._lock:
+            rows = sorted(self._words.items(), key=lambda item: (item[1][3], item[1][0]), reverse=True)
+        return [(word, row[1], row[2]) for word, row in rows]
+    
+    def _by_occurrences(self, keep) -> List[Tuple[str, int]]:
+        """(word, occurrences) for the rows passing keep, most frequent first."""
+        with self._lock:
+            rows = [(word, row[4]) for word, row in self._words.items() if keep(row)]
+        rows.sort(reverse=True, key=lambda item: (item[1], item[0]))
+        return rows
+    
+    def get_top_words(self, k: int = 10, valid_only: bool = True) -> List[Tuple[str, int]]:
+        """Get the k words seen most often in training texts, as (word, occurrences)."""
+        return self._by_occurrences(lambda row: row[4] > 0 and (row[1] or not valid_only))[:k]
+    
+    def get_words_by_occurrences(self, min_occurrences: int, max_occurrences: Optional[int] = None,
+                                 limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Get the words seen between min and max times (inclusive), most frequent first."""
+        if max_occurrences is None:
+            rows = self._by_occurrences(lambda row: min_occurrences <= row[4])
+        else:
+            rows = self._by_occurrences(lambda row: min_occurrences <= row[4] <= max_occurrences)
+        return rows if limit is None else rows[:limit]
+    
+    def get_valid_words(self) -> List[str]:
+        """Get every valid word."""
+        with self._lock:
+            return [word for word, row in self._words.items() if row[1]]
+    
+    def iter_label_changes(self, last_revision: int = 0) -> Iterator[Tuple[int, str, bool]]:
+        """Yield (label revision, word, is_valid) for the words added or relabeled after last_revision."""
+        with self._lock:
+            rows = []
+            for index in range(bisect_right(self._revisions, last_revision), len(self._revisions)):
+                revision, word = self._revisions[index], self._revision_words[index]
+                row = self._words.get(word)
+                # Skip slots left behind by relabeled and deleted words
+                if row is not None and row[5] == revision:
+                    rows.append((revision, word, row[1]))
+        yield from rows
+    
+    def _add_sequences(self, counts: Dict[Tuple[str, ...], int]):
+        """Add counts to (word1, word2) pairs that are already lowercase."""
+        with self._lock:
+            for (word1, word2), count in counts.items():
+                successors = self._successors.setdefault(word1, {})
+                if word2 not in successors:
+                    self._sequence_count += 1
+                successors[word2] = successors.get(word2, 0) + count
+            self.sequence_revision += 1
+    
+    def add_word_sequence(self, word1: str, word2: str) -> bool:
+        """Count one more occurrence of word2 following word1."""
+        self._add_sequences({(word1.lower(), word2.lower()): 1})
+        self._update_sources([word1.lower()])
+        return True
+    
+    def add_word_sequences_bulk(self, sequences: Dict[Tuple[str, str], int]) -> bool:
+        """Add counts for many (word1, word2) pairs, e.g. a ``Counter`` built from a text."""
+        counts = lowercase_counts(sequences)
+        self._add_sequences(counts)
+        self._update_sources(word1 for word1, _ in counts)
+        return True
+    
+    def get_word_sequences(self, word: str) -> List[Tuple[str, int]]:
+        """Get (word2, frequency) for the successors of a word, most frequent first."""
+        with self._lock:
+            successors = list(self._successors.get(word.lower(), {}).items())
+        successors.sort(key=lambda item: item[1], reverse=True)
+        return successors
+    
+    def get_sequence_frequencies(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Look up the frequencies of many pairs; unseen pairs are left out."""
+        frequencies = {}
+        with self._lock:
+            for word1, word2 in pairs:
+                word1, word2 = word1.lower(), word2.lower()
+                frequency = self._successors.get(word1, {}).get(word2)
+                if frequency is not None:
+                    frequencies[(word1, word2)] = frequency
+        return frequencies
+    
+    def _add_ngrams(self, counts: Dict[Tuple[str, ...], int]):
+        """Add counts to n-grams of order 3 or higher that are already lowercase."""
+        with self._lock:
+            for ngram, count in counts.items():
+                table = self._ngrams.setdefault(len(ngram), {})
+                if ngram not in table:
+                    self._ngram_count += 1
+                table[ngram] = table.get(ngram, 0) + count
+            self.sequence_revision += 1
+    
+    def add_ngrams_bulk(self, ngrams: Dict[Tuple[str, ...], int]) -> bool:
+        """Add counts for many n-grams of order 3 or higher."""
+        self._add_ngrams(lowercase_counts(ngrams))
+        return True
+    
+    def get_max_ngram_order(self) -> int:
+        """Get the highest n-gram order stored, at least 2 (the bigrams)."""
+        with self._lock:
+            return max([n for n, table in self._ngrams.items() if table], default=2)
+    
+    def iter_ngrams(self, n: int, ordered: bool = False) -> Iterator[Tuple[Tuple[str, ...], int]]:
+        """Iterate over every stored n-gram of order n as (words, frequency)."""
+        with self._lock:
+            if n == 2:
+                rows = [((word1, word2), frequency) for word1, successors in self._successors.items()
+                        for word2, frequency in successors.items()]
+            else:
+                rows = list(self._ngrams.get(n, {}).items())
+        if ordered:
+            rows.sort()
+        yield from rows
+    
+    def _get_source_words(self) -> List[str]:
+        """Get every word that has at least one stored successor."""
+        with self._lock:
+            return list(self._successors)
+    
+    def get_start_words(self) -> List[str]:
+        """Get the valid words that have at least one stored successor."""
+        with self._lock:
+            return [word for word in self._successors if word in self._words and self._words[word][1]]
+    
+    def iter_word_sequences(self) -> Iterator[Tuple[str, str, int]]:
+        """Iterate over every stored (word1, word2, frequency) sequence."""
+        with self._lock:
+            rows = [(word1, word2, frequency) for word1, successors in self._successors.items()
+                    for word2, frequency in successors.items()]
+        yield from rows
+    
+    def add_training_text(self, text: str, source: Optional[str] = None,
+                          ngram_order: Optional[int] = None) -> bool:
+        """Store a training text and the n-gram order it is learned with; False if already stored."""
+        digest = content_hash(text)
+        with self._lock:
+            if digest in self._text_hashes:
+                return False
+            text_id = self._next_text_id
+            self._next_text_id += 1
+            self._texts[text_id] = [source, text, digest, _timestamp(), ngram_order]
+            self._text_hashes[digest] = text_id
+            return True
+    
+    def has_training_text(self, text: str) -> bool:
+        """Check whether a training text is already stored, by its content hash."""
+        return content_hash(text) in self._text_hashes
+    
+    def get_training_text(self, text_id: int) -> Optional[str]:
+        """Get a stored training text by id."""
+        row = self._texts.get(text_id)
+        return row[1] if row else None
+    
+    def get_training_text_order(self, text_id: int) -> Optional[int]:
+        """Get the n-gram order a stored training text was learned with, if known."""
+        row = self._texts.get(text_id)
+        return row[4] if row else None
+    
+    def set_training_text_orders(self, ngram_order: int):
+        """Record that every stored training text is now learned with the given n-gram order."""
+        with self._lock:
+            for row in self._texts.values():
+                row[4] = ngram_order
+    
+    def iter_training_texts(self, page_size: int = 100) -> Iterator[Tuple[int, Optional[str], str]]:
+        """Iterate over every stored (id, source, text) training text, oldest first."""
+        with self._lock:
+            rows = [(text_id, row[0], row[1]) for text_id, row in self._texts.items()]
+        yield from rows
+    
+    def get_training_text_ids(self, source: str) -> List[int]:
+        """Get the ids of the training texts stored for a source, oldest first."""
+        with self._lock:
+            return [text_id for text_id, row in self._texts.items() if row[0] == source]
+    
+    def subtract_training_text(self, text_id: int, word_counts: Dict[str, int],
+                               ngram_counts: Dict[int, Dict[Tuple[str, ...], int]]) -> bool:
+        """Delete a training text and subtract the counts it contributed.
+        
+        Follows WordDatabase: sequences and n-grams whose frequency drops to
+        zero are deleted, as are words learned from text that are no longer
+        seen, unless the occurrence counts are flagged as incomplete.
+        """
+        bigrams = ngram_counts.get(2, {})
+        with self._lock:
+            for (word1, word2), count in bigrams.items():
+                successors = self._successors.get(word1)
+                if successors is None or word2 not in successors:
+                    continue
+                successors[word2] -= count
+                if successors[word2] <= 0:
+                    del successors[word2]
+                    self._sequence_count -= 1
+            for n, counts in ngram_counts.items():
+                table = self._ngrams.get(n) if n > 2 else None
+                if table is None:
+                    continue
+                for ngram, count in counts.items():
+                    if ngram in table:
+                        table[ngram] -= count
+                        if table[ngram] <= 0:
+                            del table[ngram]
+                            self._ngram_count -= 1
+            forgotten = []
+            complete = not self.get_metadata(INCOMPLETE_OCCURRENCES)
+            for word, count in word_counts.items():
+                row = self._words.get(word)
+                if row is None:
+                    continue
+                row[4] = max(row[4] - count, 0)
+                if complete and row[4] == 0 and row[2] == 'text_learning':
+                    del self._words[word]
+                    self._valid_word_count -= row[1]
+                    forgotten.append(word)
+            if forgotten:
+                self._bump_label_generation()
+            row = self._texts.pop(text_id, None)
+            if row is not None:
+                del self._text_hashes[row[2]]
+            
+            # Words left without any successor stop being start words
+            orphaned = [word1 for word1 in {word1 for word1, _ in bigrams}
+                        if not self._successors.get(word1, True)]
+            for word1 in orphaned:
+                del self._successors[word1]
+            self.sequence_revision += 1
+        self._remove_sources(orphaned)
+        self._update_vocabulary(forgotten, False)
+        return True
+    
+    def get_statistics(self) -> dict:
+        """Get learning statistics."""
+        with self._lock:
+            return {
+                'total_words': len(self._words),
+                'valid_words': self._valid_word_count,
+                'invalid_words': len(self._words) - self._valid_word_count,
+                'training_texts': len(self._texts),
+                'word_sequences': self._sequence_count,
+                'word_ngrams': self._ngram_count,
+            }
+    
+    def get_metadata(self, name: str) -> int:
+        """Get a flag or counter kept about the stored data, 0 if it was never set."""
+        return self._metadata.get(name, 0)
+    
+    def set_metadata(self, name: str, value: int) -> bool:
+        """Set a flag or counter kept about the stored data."""
+        self._metadata[name] = value
+        return True
+    
+    def _bump_label_generation(self):
+        """Tell learners following the label revisions that words were deleted."""
+        self._metadata[LABEL_GENERATION] = self._metadata.get(LABEL_GENERATION, 0) + 1
+    
+    def _clear_count_flags(self):
+        """Forget the flags about how the counts were learned."""
+        for name in COUNT_FLAGS:
+            self._metadata.pop(name, None)
+    
+    def optimize(self, full: bool = False):
+        """Drop the label revision slots left behind by relabeled and deleted words."""
+        with self._lock:
+            rows = sorted((row[5], word) for word, row in self._words.items())
+            self._revisions = array('q', [revision for revision, _ in rows])
+            self._revision_words = [word for _, word in rows]
+    
+    def clear_counts(self):
+        """Delete every learned sequence, n-gram and word occurrence count.
+        
+        The words themselves and the training texts are kept. Flags about how
+        the counts were learned go with them.
+        """
+        with self._lock:
+            for row in self._words.values():
+                row[4] = 0
+            self._successors = {}
+            self._sequence_count = 0
+            self._ngrams = {}
+            self._ngram_count = 0
+            self._clear_count_flags()
+            self.sequence_revision += 1
+        self._reset_vocabulary(sources_only=True)
+    
+    def clear_database(self):
+        """Delete everything."""
+        with self._lock:
+            self._reset()
+            self._clear_count_flags()
+            self._bump_label_generation()
+            self.sequence_revision += 1
+        self._reset_vocabulary()
+    
+    def export_rows(self) -> Dict[str, list]:
+        """Get every stored row, in the format import_rows takes."""
+        with self._lock:
+            words = sorted((row[0], word, int(row[1]), row[2], row[3], row[4], row[5])
+                           for word, row in self._words.items())
+            return {
+                'words': words,
+                'word_sequences': list(self.iter_word_sequences()),
+                'word_ngrams': [(n, ' '.join(ngram[:-1]), ngram[-1], frequency)
+                                for n, table in self._ngrams.items()
+                                for ngram, frequency in table.items()],
+                'training_texts': [(text_id, row[0], row[1], row[3], row[4]) for text_id, row in self._texts.items()],
+                'metadata': list(self._metadata.items()),
+            }
+    
+    def import_rows(self, rows: Dict[str, list]) -> bool:
+        """Replace everything stored with rows from export_rows."""
+        with self._lock:
+            self._reset()
+            generation = max(self._metadata.get(LABEL_GENERATION, 0), dict(rows['metadata']).get(LABEL_GENERATION, 0))
+            self._metadata = dict(rows['metadata'])
+            # Past both generations, so learners of either copy start over
+            self._metadata[LABEL_GENERATION] = generation + 1
+            for word_id, word, is_valid, learned_from, created_at, occurrences, label_revision in sorted(
+                    rows['words'], key=lambda row: row[6]):
+                self._insert_word(word, bool(is_valid), learned_from, occurrences, word_id, created_at, label_revision)
+            for word1, word2, frequency in rows['word_sequences']:
+                self._successors.setdefault(word1, {})[word2] = frequency
+            self._sequence_count = len(rows['word_sequences'])
+            for n, context, word, frequency in rows['word_ngrams']:
+                self._ngrams.setdefault(n, {})[(*context.split(' '), word)] = frequency
+            self._ngram_count = len(rows['word_ngrams'])
+            for text_id, source, text, processed_at, ngram_order in sorted(rows['training_texts']):
+                digest = content_hash(text)
+                self._texts[text_id] = [source, text, digest, processed_at, ngram_order]
+                self._text_hashes[digest] = text_id
+                self._next_text_id = text_id + 1
+            self.sequence_revision += 1
+        self._invalidate_vocabulary()
+        return True
+    
+    def save(self, db_path: str) -> bool:
+        """Write everything to a SQLite database file, replacing what it held."""
+        with WordDatabase(db_path) as db:
+            return db.import_rows(self.export_rows())
+    
+    @classmethod
+    def load(cls, db_path: str) -> 'MemoryWordStore':
+        """Read everything from a SQLite database file into a new store."""
+        store = cls()
+        with WordDatabase(db_path) as db:
+            store.import_rows(db.export_rows())
+        return store
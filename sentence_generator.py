@@ -1,38 +1,69 @@
 import random
-from typing import List, Tuple, Optional
-from database import WordDatabase
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+from storage import WordStore
+from markov_model import TransitionModel
 
 class SentenceGenerator:
-    def __init__(self, database: WordDatabase):
-        """Initialize the sentence generator with a database connection."""
+    def __init__(self, database: WordStore, model: Optional[TransitionModel] = None):
+        """Initialize the sentence generator with a database connection.
+        
+        A ``model`` (such as a loaded snapshot) is used as-is instead of being
+        built from the database. If it carries the valid words, they are used
+        too, and nothing needed for generation is read from the database.
+        """
         self.db = database
+        self._model = model
+        self._model_revision = None
+        self._fixed_model = model is not None
+        # Least recently used cache of bigram frequencies for quality scoring
+        self.bigram_cache_size = 100000
+        self._bigram_cache = OrderedDict()
+        self._bigram_cache_revision = None
+        self._bigram_cache_lock = threading.Lock()
+    
+    @property
+    def model(self) -> TransitionModel:
+        """The transition model, rebuilt when the stored sequences change."""
+        if self._fixed_model:
+            return self._model
+        revision = self.db.sequence_revision
+        if self._model is None or self._model_revision != revision:
+            self._model = TransitionModel.from_database(self.db)
+            self._model_revision = revision
+        return self._model
+    
+    @property
+    def vocabulary(self):
+        """The valid words, from a fixed model that carries them or else the database's cache."""
+        if self._fixed_model and self._model.vocabulary is not None:
+            return self._model.vocabulary
+        return self.db.vocabulary
     
     def generate_sentence(self, max_length: int = 15, min_length: int = 3) -> str:
         """Generate a sentence using Markov chain from learned words."""
-        # Get all valid words from database
-        valid_words = self.db.get_valid_words()
+        # Get the cached valid words
+        vocabulary = self.vocabulary
         
-        if not valid_words:
+        if not vocabulary:
             return "No words learned yet. Please learn some words first!"
         
+        model = self.model
+        
         # Start with a random word
-        current_word = random.choice(valid_words)
-        sentence_words = [current_word]
+        sentence_words = [vocabulary.random_word()]
         
         # Generate the rest of the sentence using Markov chain
         for _ in range(max_length - 1):
-            # Get possible next words
-            next_words = self.db.get_word_sequences(current_word)
+            # Choose next word based on frequency, backing off to shorter contexts
+            next_word = model.next_word(sentence_words)
             
-            if not next_words:
+            if next_word is None:
                 # If no sequences found, choose a random word
-                next_word = random.choice(valid_words)
-            else:
-                # Choose next word based on frequency
-                next_word = self._weighted_choice(next_words)
+                next_word = vocabulary.random_word()
             
             sentence_words.append(next_word)
-            current_word = next_word
             
             # Stop if we have enough words and hit a natural stopping point
             if len(sentence_words) >= min_length and random.random() < 0.3:
@@ -43,63 +74,84 @@ class SentenceGenerator:
         
         return sentence
     
-    def _weighted_choice(self, choices: List[Tuple[str, int]]) -> str:
-        """Choose a word based on frequency weights."""
-        if not choices:
-            return ""
-        
-        words, frequencies = zip(*choices)
-        total_frequency = sum(frequencies)
-        
-        # Create weighted probabilities
-        probabilities = [freq / total_frequency for freq in frequencies]
+    def generate_multiple_sentences(self, count: int, max_length: int = 15, min_length: int = 3) -> List[str]:
+        """Generate multiple sentences."""
+        return list(self.iter_sentences(count, max_length, min_length))
+    
+    def iter_sentences(self, count: int, max_length: int = 15, min_length: int = 3,
+                       batch_size: int = 1000) -> Iterator[str]:
+        """Generate sentences like generate_sentence, streaming them batch by batch.
         
-        # Choose based on probabilities
-        rand = random.random()
-        cumulative = 0
+        Each batch advances all of its sentences one word at a time, working on
+        word ids and drawing the random numbers for a whole step at once, so
+        the per-sentence overhead of generate_sentence is paid once per batch.
+        """
+        vocabulary = self.vocabulary
+        if not vocabulary:
+            for _ in range(count):
+                yield "No words learned yet. Please learn some words first!"
+            return
         
-        for i, prob in enumerate(probabilities):
-            cumulative += prob
-            if rand <= cumulative:
-                return words[i]
+        model = self.model
+        model_words = model.words
+        word_id = model.word_ids.get
+        choose_next_id = model.choose_next_id
+        draw = random.random
         
-        # Fallback to last choice
-        return words[-1]
-    
-    def generate_multiple_sentences(self, count: int, max_length: int = 15, min_length: int = 3) -> List[str]:
-        """Generate multiple sentences."""
-        sentences = []
-        for _ in range(count):
-            sentence = self.generate_sentence(max_length, min_length)
-            sentences.append(sentence)
-        return sentences
+        while count > 0:
+            size = min(batch_size, count)
+            count -= size
+            sentences = [[vocabulary.random_word()] for _ in range(size)]
+            histories = [[word_id(words[0])] for words in sentences]
+            active = list(range(size))
+            
+            for _ in range(max_length - 1):
+                if not active:
+                    break
+                points = [draw() for _ in active]
+                stops = [draw() for _ in active]
+                still_active = []
+                for index, point, stop in zip(active, points, stops):
+                    history = histories[index]
+                    next_id = choose_next_id(history, point)
+                    if next_id is None:
+                        # If no sequences found, choose a random word
+                        next_word = vocabulary.random_word()
+                        next_id = word_id(next_word)
+                    else:
+                        next_word = model_words[next_id]
+                    sentences[index].append(next_word)
+                    history.append(next_id)
+                    
+                    # Same stopping rule as generate_sentence
+                    if len(history) < min_length or stop >= 0.3:
+                        still_active.append(index)
+                active = still_active
+            
+            for words in sentences:
+                yield ' '.join(words).capitalize() + '.'
     
     def generate_sentence_with_seed(self, seed_word: str, max_length: int = 15) -> str:
         """Generate a sentence starting with a specific word."""
-        # Check if seed word exists in database
-        word_info = self.db.get_word(seed_word)
-        if not word_info or not word_info[1]:  # Word doesn't exist or is invalid
+        # Check if seed word is a learned valid word
+        vocabulary = self.vocabulary
+        if seed_word.lower() not in vocabulary:
             return f"Word '{seed_word}' not found in learned words."
         
-        sentence_words = [seed_word]
-        current_word = seed_word
+        model = self.model
+        sentence_words = [seed_word.lower()]
         
         # Generate the rest of the sentence
         for _ in range(max_length - 1):
-            next_words = self.db.get_word_sequences(current_word)
+            next_word = model.next_word(sentence_words)
             
-            if not next_words:
+            if next_word is None:
                 # If no sequences found, choose a random valid word
-                valid_words = self.db.get_valid_words()
-                if valid_words:
-                    next_word = random.choice(valid_words)
-                else:
+                next_word = vocabulary.random_word()
+                if next_word is None:
                     break
-            else:
-                next_word = self._weighted_choice(next_words)
             
             sentence_words.append(next_word)
-            current_word = next_word
             
             # Random stopping point
             if random.random() < 0.3:
@@ -114,22 +166,19 @@ class SentenceGenerator:
         """Generate variations of a base sentence."""
         words = base_sentence.lower().strip('.,!?').split()
         variations = []
+        model = self.model
         
         for _ in range(count):
-            variation_words = []
-            current_word = random.choice(words)
-            variation_words.append(current_word)
+            variation_words = [random.choice(words)]
             
             # Generate variation using Markov chain
             for _ in range(len(words)):
-                next_words = self.db.get_word_sequences(current_word)
+                next_word = model.next_word(variation_words)
                 
-                if not next_words:
+                if next_word is None:
                     break
                 
-                next_word = self._weighted_choice(next_words)
                 variation_words.append(next_word)
-                current_word = next_word
                 
                 if random.random() < 0.4:
                     break
@@ -141,8 +190,54 @@ class SentenceGenerator:
     
     def analyze_sentence_quality(self, sentence: str) -> dict:
         """Analyze the quality of a generated sentence."""
-        words = sentence.lower().strip('.,!?').split()
+        return self.analyze_sentences([sentence])[0]
+    
+    def _get_bigram_frequencies(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Get the frequencies of word pairs, from the cache where possible.
+        
+        The pairs the cache is missing are read from the model's bigram table,
+        outside the cache lock, so concurrent callers only queue for the cache
+        itself. The cache is emptied whenever the stored sequences change.
+        """
+        revision = self.db.sequence_revision
+        with self._bigram_cache_lock:
+            cache = self._bigram_cache
+            if self._bigram_cache_revision != revision:
+                cache.clear()
+                self._bigram_cache_revision = revision
+            
+            frequencies = {}
+            missing = []
+            for pair in dict.fromkeys(pairs):
+                frequency = cache.get(pair)
+                if frequency is None:
+                    missing.append(pair)
+                else:
+                    cache.move_to_end(pair)
+                    frequencies[pair] = frequency
         
+        if missing:
+            model = self.model
+            found = {pair: model.frequency(pair) for pair in missing}
+            frequencies.update(found)
+            with self._bigram_cache_lock:
+                # Skip caching if the sequences changed while the pairs were looked up
+                if self._bigram_cache_revision == revision:
+                    # Unseen pairs are cached as 0 so they aren't looked up again
+                    cache.update(found)
+                    while len(cache) > self.bigram_cache_size:
+                        cache.popitem(last=False)
+        return frequencies
+    
+    def analyze_sentences(self, sentences: Iterable[str]) -> List[dict]:
+        """Analyze the quality of many sentences, looking up all their word pairs at once."""
+        sentence_words = [sentence.lower().strip('.,!?').split() for sentence in sentences]
+        frequencies = self._get_bigram_frequencies(
+            pair for words in sentence_words for pair in zip(words, words[1:]))
+        return [self._score_sentence(words, frequencies) for words in sentence_words]
+    
+    def _score_sentence(self, words: List[str], frequencies: Dict[Tuple[str, str], int]) -> dict:
+        """Score one sentence's words given the frequencies of its word pairs."""
         if not words:
             return {
                 'word_count': 0,
@@ -156,16 +251,7 @@ class SentenceGenerator:
         avg_word_length = sum(len(word) for word in words) / word_count
         
         # Calculate coherence score based on learned sequences
-        coherence_score = 0
-        for i in range(len(words) - 1):
-            sequences = self.db.get_word_sequences(words[i])
-            if sequences:
-                # Check if next word appears in sequences
-                next_word = words[i + 1]
-                for seq_word, freq in sequences:
-                    if seq_word == next_word:
-                        coherence_score += freq
-                        break
+        coherence_score = sum(frequencies[pair] for pair in zip(words, words[1:]))
         
         # Normalize coherence score
         if word_count > 1:
@@ -188,31 +274,26 @@ class SentenceGenerator:
     
     def get_available_start_words(self) -> List[str]:
         """Get words that can be used to start sentences."""
-        valid_words = self.db.get_valid_words()
-        start_words = []
-        
-        for word in valid_words:
-            # Check if this word has sequences (can be followed by other words)
-            sequences = self.db.get_word_sequences(word)
-            if sequences:
-                start_words.append(word)
-        
-        return start_words
+        # Valid words that have sequences (can be followed by other words)
+        if self._fixed_model and self._model.vocabulary is not None:
+            return self._model.vocabulary.start_words()
+        return self.db.get_start_words()
     
     def get_sentence_statistics(self) -> dict:
         """Get statistics about sentence generation capabilities."""
         stats = self.db.get_statistics()
         
-        # Calculate additional metrics
-        valid_words = self.db.get_valid_words()
-        start_words = self.get_available_start_words()
+        # Calculate additional metrics from the cached vocabulary
+        vocabulary = self.vocabulary
+        valid_words = len(vocabulary)
+        start_words = vocabulary.start_word_count
         
         return {
             'total_words': stats['total_words'],
             'valid_words': stats['valid_words'],
             'word_sequences': stats['word_sequences'],
-            'available_start_words': len(start_words),
-            'generation_ready': len(valid_words) > 0 and stats['word_sequences'] > 0
+            'available_start_words': start_words,
+            'generation_ready': valid_words > 0 and stats['word_sequences'] > 0
         }
     
     def improve_sentence_generation(self, feedback: str, sentence: str) -> bool:
@@ -0,0 +1,228 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import List, Optional, Tuple
+from database import WordDatabase
+from markov_model import TransitionModel
+from sentence_generator import SentenceGenerator
+
+# Request bodies larger than this are rejected
+MAX_BODY_SIZE = 1 << 20
+
+class RequestError(Exception):
+    """A request that can't be served, answered with the given HTTP status."""
+    
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+class SentenceServer:
+    """Serves sentence generation and scoring over HTTP/JSON.
+    
+    The generator's model and vocabulary are loaded once and only read while
+    serving; nothing is written to the database. Generation requests that
+    arrive within ``batch_window`` seconds of each other are run together as
+    one batch on the worker pool.
+    """
+    
+    def __init__(self, generator: SentenceGenerator, workers: int = 4,
+                 batch_window: float = 0.002, max_batch: int = 256):
+        """Initialize the server around a ready-to-use sentence generator."""
+        self.generator = generator
+        self.executor = ThreadPoolExecutor(workers)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = None
+        self.routes = {
+            ('GET', '/health'): self.handle_health,
+            ('POST', '/generate'): self.handle_generate,
+            ('POST', '/generate_with_seed'): self.handle_generate_with_seed,
+            ('POST', '/analyze'): self.handle_analyze,
+        }
+    
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        """Accept connections until cancelled."""
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_loop())
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown(wait=False)
+    
+    async def _run(self, function, *args):
+        """Run a blocking call on the worker pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+    
+    async def _batch_loop(self):
+        """Group queued generation requests into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.create_task(self._dispatch_batch(batch))
+    
+    async def _dispatch_batch(self, batch: List[tuple]):
+        """Generate the sentences of a batch and hand each request its share."""
+        try:
+            results = await self._run(self._generate_batch, [request[:3] for request in batch])
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (*_, future), sentences in zip(batch, results):
+            if not future.done():
+                future.set_result(sentences)
+    
+    def _generate_batch(self, requests: List[Tuple[int, int, int]]) -> List[List[str]]:
+        """Generate (count, max_length, min_length) requests, one pass per length setting."""
+        results = [None] * len(requests)
+        by_lengths = {}
+        for index, (_, max_length, min_length) in enumerate(requests):
+            by_lengths.setdefault((max_length, min_length), []).append(index)
+        for (max_length, min_length), indexes in by_lengths.items():
+            total = sum(requests[index][0] for index in indexes)
+            sentences = iter(self.generator.iter_sentences(total, max_length, min_length))
+            for index in indexes:
+                results[index] = [next(sentences) for _ in range(requests[index][0])]
+        return results
+    
+    async def handle_health(self, body: dict) -> dict:
+        """Report that the server is up."""
+        return {'status': 'ok'}
+    
+    async def handle_generate(self, body: dict) -> dict:
+        """Generate one or more sentences."""
+        count = _int_field(body, 'count', 1, 1, 10000)
+        max_length = _int_field(body, 'max_length', 15, 1, 1000)
+        min_length = _int_field(body, 'min_length', 3, 1, 1000)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((count, max_length, min_length, future))
+        return {'sentences': await future}
+    
+    async def handle_generate_with_seed(self, body: dict) -> dict:
+        """Generate a sentence starting with a given word."""
+        seed_word = body.get('seed_word')
+        if not isinstance(seed_word, str) or not seed_word:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'seed_word' must be a non-empty string")
+        max_length = _int_field(body, 'max_length', 15, 1, 1000)
+        sentence = await self._run(self.generator.generate_sentence_with_seed, seed_word, max_length)
+        return {'sentence': sentence}
+    
+    async def handle_analyze(self, body: dict) -> dict:
+        """Score the quality of one sentence or a list of them."""
+        if 'sentences' in body:
+            sentences = body['sentences']
+            if not isinstance(sentences, list) or not all(isinstance(s, str) for s in sentences):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "'sentences' must be a list of strings")
+            analyses = await self._run(self.generator.analyze_sentences, sentences)
+            return {'results': analyses}
+        sentence = body.get('sentence')
+        if not isinstance(sentence, str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'sentence' must be a string")
+        return await self._run(self.generator.analyze_sentence_quality, sentence)
+    
+    async def _respond(self, method: str, path: str, body: bytes) -> Tuple[HTTPStatus, dict]:
+        """Route a request and turn errors into JSON responses."""
+        handler = self.routes.get((method, path.split('?', 1)[0]))
+        try:
+            if handler is None:
+                if any(route_path == path for _, route_path in self.routes):
+                    raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported here")
+                raise RequestError(HTTPStatus.NOT_FOUND, f"No such endpoint: {path}")
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON") from None
+            if not isinstance(payload, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+            return HTTPStatus.OK, await handler(payload)
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection, keeping it open when allowed."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                if len(parts) != 3:
+                    status, payload = HTTPStatus.BAD_REQUEST, {'error': "Malformed request line"}
+                    keep_alive = False
+                else:
+                    method, path, version = parts
+                    try:
+                        length = int(headers.get('content-length') or 0)
+                    except ValueError:
+                        length = -1
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    if length < 0:
+                        # The body can't be skipped without its length, so the connection goes too
+                        status, payload = HTTPStatus.BAD_REQUEST, {'error': "Invalid Content-Length"}
+                        keep_alive = False
+                    elif length > MAX_BODY_SIZE:
+                        status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "Request body too large"}
+                        keep_alive = False
+                    else:
+                        body = await reader.readexactly(length) if length else b''
+                        status, payload = await self._respond(method, path, body)
+                
+                data = json.dumps(payload).encode('utf-8')
+                writer.write((f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+def _int_field(body: dict, name: str, default: int, minimum: int, maximum: int) -> int:
+    """Read an integer field from a request body, checking its range."""
+    value = body.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not minimum <= value <= maximum:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"'{name}' must be an integer from {minimum} to {maximum}")
+    return value
+
+def run_server(db_path: str, host: str = '127.0.0.1', port: int = 8080, workers: int = 4,
+               batch_window: float = 0.002, snapshot: Optional[str] = None):
+    """Load the model from a database (or a snapshot) and serve it until interrupted."""
+    with WordDatabase(db_path) as db:
+        model = TransitionModel.from_snapshot(snapshot) if snapshot else None
+        generator = SentenceGenerator(db, model)
+        # Load everything up front so no request pays for it
+        _ = generator.model
+        _ = generator.vocabulary
+        server = SentenceServer(generator, workers, batch_window)
+        print(f"Serving on http://{host}:{port}")
+        try:
+            asyncio.run(server.serve(host, port))
+        except KeyboardInterrupt:
+            pass
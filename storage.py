@@ -0,0 +1,273 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from vocabulary import Vocabulary
+
+# Metadata flag: some counts were learned without storing their text, so rebuild can't recount them
+UNTRACKED_COUNTS = 'untracked_counts'
+# Metadata flag: some word occurrences may be too low, so words at zero can't be taken as unseen
+INCOMPLETE_OCCURRENCES = 'incomplete_occurrences'
+# Metadata counter: the label revision last given to a word, as it was added or relabeled
+LABEL_REVISION = 'label_revision'
+# Metadata counter: bumped whenever words are deleted or replaced, which label revisions can't show
+LABEL_GENERATION = 'label_generation'
+# Metadata flags describing the counts, cleared whenever the counts are
+COUNT_FLAGS = (UNTRACKED_COUNTS, INCOMPLETE_OCCURRENCES)
+
+def count_words(words: Iterable[str]) -> Dict[str, int]:
+    """Lowercase words for storage, with the occurrences each adds.
+    
+    A dict such as a ``Counter`` gives occurrence counts; words from any other
+    iterable add none.
+    """
+    counts = {}
+    if isinstance(words, dict):
+        for word, count in words.items():
+            word = word.lower()
+            counts[word] = counts.get(word, 0) + count
+    else:
+        for word in words:
+            counts.setdefault(word.lower(), 0)
+    return counts
+
+def lowercase_counts(counts: Dict[Tuple[str, ...], int]) -> Dict[Tuple[str, ...], int]:
+    """Merge word tuple counts such as sequences or n-grams under their lowercase words."""
+    lowered = {}
+    for words, count in counts.items():
+        words = tuple(word.lower() for word in words)
+        lowered[words] = lowered.get(words, 0) + count
+    return lowered
+
+class WordStore(ABC):
+    """Storage for labeled words, word sequences, n-grams and training texts.
+    
+    TextProcessor, SentenceGenerator and the tools only use this interface.
+    WordDatabase keeps everything in SQLite; MemoryWordStore keeps it in
+    memory. Subclasses bump ``sequence_revision`` on every sequence or n-gram
+    write and keep the ``vocabulary`` cache in sync through the helpers here.
+    """
+    
+    def __init__(self):
+        """Initialize the state shared by every backend."""
+        # Bumped on every word_sequences write so in-memory models know to reload
+        self.sequence_revision = 0
+        # Valid words, loaded on first use and then kept in sync by add_word
+        self._vocabulary = None
+        self._vocabulary_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @property
+    def vocabulary(self) -> Vocabulary:
+        """Cached valid words, for fast random picks and membership checks."""
+        with self._vocabulary_lock:
+            if self._vocabulary is None:
+                self._vocabulary = Vocabulary(self.get_valid_words(), self._get_source_words())
+            return self._vocabulary
+    
+    def _update_vocabulary(self, words: Iterable[str], is_valid: bool):
+        """Apply a word write to the vocabulary cache if it has been loaded."""
+        with self._vocabulary_lock:
+            if self._vocabulary is not None:
+                self._vocabulary.update(words, is_valid)
+    
+    def _update_sources(self, words: Iterable[str]):
+        """Apply a sequence write to the vocabulary cache if it has been loaded."""
+        with self._vocabulary_lock:
+            if self._vocabulary is not None:
+                self._vocabulary.add_sources(words)
+    
+    def _remove_sources(self, words: Iterable[str]):
+        """Apply removed sequences to the vocabulary cache if it has been loaded."""
+        with self._vocabulary_lock:
+            if self._vocabulary is not None:
+                self._vocabulary.remove_sources(words)
+    
+    def _reset_vocabulary(self, sources_only: bool = False):
+        """Empty the vocabulary cache (or just its start words) if it has been loaded."""
+        with self._vocabulary_lock:
+            if self._vocabulary is not None:
+                if sources_only:
+                    self._vocabulary.clear_sources()
+                else:
+                    self._vocabulary.clear()
+    
+    def _invalidate_vocabulary(self):
+        """Drop the vocabulary cache so it is reloaded from the stored rows on next use."""
+        with self._vocabulary_lock:
+            self._vocabulary = None
+    
+    def get_start_word_count(self) -> int:
+        """Number of valid words with successors, kept up to date in memory."""
+        return self.vocabulary.start_word_count
+    
+    @abstractmethod
+    def close(self):
+        """Release the resources held by the store."""
+    
+    @abstractmethod
+    def add_word(self, word: str, is_valid: bool, learned_from: str = 'guessing') -> bool:
+        """Add a word or update its label."""
+    
+    @abstractmethod
+    def add_words_bulk(self, words: Iterable[str], is_valid: bool = True,
+                       learned_from: str = 'guessing', relabel: bool = True) -> bool:
+        """Add or update many words; a dict of counts also adds occurrences.
+        
+        With ``relabel`` False, words already stored keep their label and
+        only gain occurrences.
+        """
+    
+    @abstractmethod
+    def add_counts(self, word_counts: Dict[str, int], ngram_counts: Dict[int, Dict[Tuple[str, ...], int]],
+                   relabel: bool = True, text: Optional[str] = None, source: Optional[str] = None,
+                   ngram_order: Optional[int] = None) -> bool:
+        """Add the word and n-gram counts learned from text in one transaction.
+        
+        The words are labeled valid, unless ``relabel`` is False and they are
+        already stored. With ``text``, the training text is stored in the
+        same transaction, and if it was stored before nothing is written and
+        the result is False. Errors are raised and leave nothing written.
+        """
+    
+    @abstractmethod
+    def get_word(self, word: str) -> Optional[Tuple[str, bool, str]]:
+        """Get (word, is_valid, learned_from) for a word, or None."""
+    
+    @abstractmethod
+    def get_all_words(self) -> List[Tuple[str, bool, str]]:
+        """Get every word as (word, is_valid, learned_from), newest first."""
+    
+    @abstractmethod
+    def get_top_words(self, k: int = 10, valid_only: bool = True) -> List[Tuple[str, int]]:
+        """Get the k most seen words as (word, occurrences)."""
+    
+    @abstractmethod
+    def get_words_by_occurrences(self, min_occurrences: int, max_occurrences: Optional[int] = None,
+                                 limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Get the words seen between min and max times, most frequent first."""
+    
+    @abstractmethod
+    def get_valid_words(self) -> List[str]:
+        """Get every valid word."""
+    
+    @abstractmethod
+    def iter_label_changes(self, last_revision: int = 0) -> Iterator[Tuple[int, str, bool]]:
+        """Yield (label revision, word, is_valid) for the words added or relabeled after last_revision."""
+    
+    @abstractmethod
+    def add_word_sequence(self, word1: str, word2: str) -> bool:
+        """Count one more occurrence of word2 following word1."""
+    
+    @abstractmethod
+    def add_word_sequences_bulk(self, sequences: Dict[Tuple[str, str], int]) -> bool:
+        """Add counts for many (word1, word2) pairs."""
+    
+    @abstractmethod
+    def get_word_sequences(self, word: str) -> List[Tuple[str, int]]:
+        """Get (word2, frequency) for the successors of a word, most frequent first."""
+    
+    @abstractmethod
+    def get_sequence_frequencies(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Get the frequencies of the given pairs that have been seen."""
+    
+    @abstractmethod
+    def add_ngrams_bulk(self, ngrams: Dict[Tuple[str, ...], int]) -> bool:
+        """Add counts for many n-grams of order 3 or higher."""
+    
+    @abstractmethod
+    def get_max_ngram_order(self) -> int:
+        """Get the highest n-gram order stored, at least 2."""
+    
+    @abstractmethod
+    def iter_ngrams(self, n: int, ordered: bool = False) -> Iterator[Tuple[Tuple[str, ...], int]]:
+        """Iterate over the n-grams of order n as (words, frequency), sorted by words if ordered."""
+    
+    @abstractmethod
+    def _get_source_words(self) -> List[str]:
+        """Get every word that has at least one successor."""
+    
+    @abstractmethod
+    def get_start_words(self) -> List[str]:
+        """Get the valid words that have at least one successor."""
+    
+    @abstractmethod
+    def iter_word_sequences(self) -> Iterator[Tuple[str, str, int]]:
+        """Iterate over every (word1, word2, frequency) sequence."""
+    
+    @abstractmethod
+    def add_training_text(self, text: str, source: Optional[str] = None,
+                          ngram_order: Optional[int] = None) -> bool:
+        """Store a training text and the n-gram order it is learned with; False if already stored."""
+    
+    @abstractmethod
+    def has_training_text(self, text: str) -> bool:
+        """Check whether a training text is already stored."""
+    
+    @abstractmethod
+    def get_training_text(self, text_id: int) -> Optional[str]:
+        """Get a stored training text by id."""
+    
+    @abstractmethod
+    def get_training_text_order(self, text_id: int) -> Optional[int]:
+        """Get the n-gram order a stored training text was learned with, if known."""
+    
+    @abstractmethod
+    def set_training_text_orders(self, ngram_order: int):
+        """Record that every stored training text is now learned with the given n-gram order."""
+    
+    @abstractmethod
+    def iter_training_texts(self, page_size: int = 100) -> Iterator[Tuple[int, Optional[str], str]]:
+        """Iterate over every stored (id, source, text), oldest first."""
+    
+    @abstractmethod
+    def get_training_text_ids(self, source: str) -> List[int]:
+        """Get the ids of the training texts stored for a source, oldest first."""
+    
+    @abstractmethod
+    def subtract_training_text(self, text_id: int, word_counts: Dict[str, int],
+                               ngram_counts: Dict[int, Dict[Tuple[str, ...], int]]) -> bool:
+        """Delete a training text and subtract the counts it contributed."""
+    
+    @abstractmethod
+    def get_metadata(self, name: str) -> int:
+        """Get a flag or counter kept about the stored data, 0 if it was never set."""
+    
+    @abstractmethod
+    def set_metadata(self, name: str, value: int) -> bool:
+        """Set a flag or counter kept about the stored data."""
+    
+    @abstractmethod
+    def get_statistics(self) -> dict:
+        """Get the word, sequence and training text counts."""
+    
+    @abstractmethod
+    def optimize(self, full: bool = False):
+        """Do any maintenance that keeps lookups fast."""
+    
+    @abstractmethod
+    def clear_counts(self):
+        """Delete every sequence, n-gram, occurrence count and count flag, keeping words and texts."""
+    
+    @abstractmethod
+    def clear_database(self):
+        """Delete everything."""
+    
+    @abstractmethod
+    def export_rows(self) -> Dict[str, list]:
+        """Get every stored row, in the format import_rows takes.
+        
+        The keys are ``words`` (id, word, is_valid, learned_from, created_at,
+        occurrences, label_revision), ``word_sequences`` (word1, word2, frequency),
+        ``word_ngrams`` (n, context, word, frequency), ``training_texts``
+        (id, source, text, processed_at, ngram_order) and ``metadata`` (name,
+        value).
+        """
+    
+    @abstractmethod
+    def import_rows(self, rows: Dict[str, list]) -> bool:
+        """Replace everything stored with rows from export_rows."""
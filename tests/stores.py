@@ -0,0 +1,28 @@
+import os
+import tempfile
+from database import WordDatabase
+from memory_store import MemoryWordStore
+
+def counts(store):
+    """Everything the counts hold, in a form that compares equal across stores."""
+    return {
+        'sequences': sorted(store.iter_word_sequences()),
+        'ngrams': {n: sorted(store.iter_ngrams(n)) for n in range(3, 5)},
+        'occurrences': sorted(store.get_words_by_occurrences(1)),
+    }
+
+class MemoryStoreMixin:
+    """Runs a test case against MemoryWordStore."""
+    
+    def make_store(self):
+        return MemoryWordStore()
+
+class DatabaseStoreMixin:
+    """Runs a test case against WordDatabase, on a temporary file."""
+    
+    def make_store(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = WordDatabase(os.path.join(directory.name, 'words.db'))
+        self.addCleanup(store.close)
+        return store
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from cli import main
+from database import WordDatabase
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.db_path = os.path.join(self.directory, 'words.db')
+        self.text_path = os.path.join(self.directory, 'text.txt')
+        with open(self.text_path, 'w', encoding='utf-8') as file:
+            file.write("The cat sat on the mat. The dog sat on the log.")
+    
+    def run_cli(self, *argv):
+        """Run the command line, returning its exit code and what it printed to stderr."""
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            try:
+                code = main(['--db', self.db_path, *argv])
+            except SystemExit as error:
+                code = error.code
+        return code, stderr.getvalue()
+    
+    def test_order_below_bigrams_is_rejected(self):
+        for command in (['ingest', self.text_path], ['unlearn', '1'], ['rebuild'], ['export', 'out.snap']):
+            code, stderr = self.run_cli(*command, '--order', '1')
+            self.assertEqual(code, 2)
+            self.assertIn('--order: must be at least 2', stderr)
+    
+    def test_sizes_must_be_positive(self):
+        for option in ('--chunk-size', '--batch-size'):
+            code, stderr = self.run_cli('ingest', option, '0', self.text_path)
+            self.assertEqual(code, 2)
+            self.assertIn(f'{option}: must be at least 1', stderr)
+        code, stderr = self.run_cli('rebuild', '--batch-size', '-5')
+        self.assertEqual(code, 2)
+    
+    def test_missing_input_learns_nothing(self):
+        missing = os.path.join(self.directory, 'missing.txt')
+        code, stderr = self.run_cli('ingest', '--quiet', self.text_path, missing)
+        self.assertEqual(code, 1)
+        self.assertIn(f'No such file or directory: {missing}', stderr)
+        with WordDatabase(self.db_path) as db:
+            self.assertEqual(db.get_statistics()['word_sequences'], 0)
+    
+    def test_unwritable_output_is_reported(self):
+        self.run_cli('ingest', '--quiet', self.text_path)
+        code, stderr = self.run_cli('export', os.path.join(self.directory, 'missing', 'model.snap'))
+        self.assertEqual(code, 1)
+        self.assertIn('Error:', stderr)
+    
+    def test_ingest_bigrams_only(self):
+        code, _ = self.run_cli('ingest', '--quiet', '--order', '2', self.text_path)
+        self.assertEqual(code, 0)
+        with WordDatabase(self.db_path) as db:
+            self.assertEqual(db.get_max_ngram_order(), 2)
+            self.assertEqual(db.get_sequence_frequencies([('sat', 'on')]), {('sat', 'on'): 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+from database import WordDatabase
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db = WordDatabase(os.path.join(directory.name, 'words.db'))
+        self.addCleanup(self.db.close)
+    
+    def query_plans(self, method, *args) -> list:
+        """Run a WordDatabase method and return the query plan of each SELECT it ran."""
+        conn = self.db._connect()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            method(*args)
+        finally:
+            conn.set_trace_callback(None)
+        return [' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + statement))
+                for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+    
+    def test_valid_words_use_partial_index(self):
+        # Mostly valid words, analyzed, which made the planner prefer a table scan
+        self.db.add_words_bulk([f'word{i}' for i in range(2000)], True)
+        self.db.add_words_bulk([f'xq{i}' for i in range(100)], False)
+        self.db.optimize(full=True)
+        plans = self.query_plans(self.db.get_valid_words)
+        self.assertEqual(len(plans), 1)
+        self.assertIn('USING INDEX idx_words_valid', plans[0])
+        self.assertEqual(len(self.db.get_valid_words()), 2000)
+
+if __name__ == '__main__':
+    unittest.main()
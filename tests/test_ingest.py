@@ -0,0 +1,40 @@
+import sqlite3
+import unittest
+from text_processor import TextProcessor
+from .stores import DatabaseStoreMixin, MemoryStoreMixin, counts
+
+DOCUMENTS = [
+    ["The quick brown fox jumps over ", "the lazy dog. The dog sleeps ", "while the fox runs away."],
+    ["Every morning the baker opens ", "the shop and the first customers ", "buy bread before work."],
+]
+
+class IngestTests:
+    def setUp(self):
+        self.store = self.make_store()
+    
+    def test_batches_match_one_text(self):
+        results = TextProcessor(self.store).learn_from_documents(DOCUMENTS, batch_size=4)
+        self.assertGreater(results['batches'], 1)
+        expected = self.make_store()
+        processor = TextProcessor(expected)
+        for chunks in DOCUMENTS:
+            processor.learn_from_text(''.join(chunks))
+        self.assertEqual(counts(self.store), counts(expected))
+
+class MemoryIngestTest(MemoryStoreMixin, IngestTests, unittest.TestCase):
+    pass
+
+class DatabaseIngestTest(DatabaseStoreMixin, IngestTests, unittest.TestCase):
+    def test_failed_batch_is_raised(self):
+        # Fail the last write of each batch, after its words and sequences
+        conn = sqlite3.connect(self.store.db_path)
+        self.addCleanup(conn.close)
+        with conn:
+            conn.execute("CREATE TRIGGER fail BEFORE INSERT ON word_ngrams BEGIN SELECT RAISE(ABORT, 'full'); END")
+        with self.assertRaises(sqlite3.Error):
+            TextProcessor(self.store).learn_from_documents(DOCUMENTS)
+        self.assertEqual(self.store.get_all_words(), [])
+        self.assertEqual(list(self.store.iter_word_sequences()), [])
+
+if __name__ == '__main__':
+    unittest.main()
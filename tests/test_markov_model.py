@@ -0,0 +1,63 @@
+import random
+import unittest
+from collections import defaultdict
+from markov_model import NgramTable, TransitionModel
+
+def random_ngrams(rng, order, vocabulary_size, count):
+    """Random id n-grams with frequencies, sorted by id tuple as NgramTable.build needs."""
+    ngrams = {}
+    for _ in range(count):
+        ngrams[tuple(rng.randrange(vocabulary_size) for _ in range(order))] = rng.randint(1, 5)
+    return sorted(ngrams.items())
+
+class NgramTableTest(unittest.TestCase):
+    def test_successors_match_rows(self):
+        rng = random.Random(3)
+        for order in (2, 3, 4):
+            rows = random_ngrams(rng, order, 12, 300)
+            expected = defaultdict(dict)
+            for ngram, frequency in rows:
+                expected[ngram[:-1]][ngram[-1]] = frequency
+            table = NgramTable.build(order - 1, 12, rows)
+            self.assertEqual(len(table), len(rows))
+            for context, successors in expected.items():
+                start, end = table.successors(context)
+                self.assertEqual(list(table.targets[start:end]), sorted(successors))
+                for target, frequency in successors.items():
+                    self.assertEqual(table.frequency(context, target), frequency)
+            # Contexts that never occurred, including ids past the vocabulary
+            for context in ((11,) * (order - 1), (12,) * (order - 1)):
+                if context not in expected:
+                    start, end = table.successors(context)
+                    self.assertEqual(start, end)
+    
+    def test_pick_follows_frequencies(self):
+        table = NgramTable.build(1, 3, [((0, 1), 1), ((0, 2), 3)])
+        start, end = table.successors((0,))
+        self.assertEqual(table.pick(start, end, 0.0), 1)
+        self.assertEqual(table.pick(start, end, 0.24), 1)
+        self.assertEqual(table.pick(start, end, 0.25), 2)
+        self.assertEqual(table.pick(start, end, 0.99), 2)
+
+class BackoffTest(unittest.TestCase):
+    def setUp(self):
+        self.model = TransitionModel.from_ngrams({
+            2: [(('a', 'b'), 1), (('b', 'c'), 2), (('x', 'c'), 1)],
+            3: [(('a', 'b', 'a'), 4)],
+        })
+    
+    def test_longest_context_wins(self):
+        self.assertEqual(self.model.next_word(['a', 'b']), 'a')
+    
+    def test_backs_off_to_bigrams(self):
+        # No trigram continues "x b", so the bigram "b c" is used
+        self.assertEqual(self.model.next_word(['x', 'b']), 'c')
+        self.assertEqual(self.model.next_word(['unseen', 'b']), 'c')
+        self.assertEqual(self.model.next_word(['b']), 'c')
+    
+    def test_nothing_follows(self):
+        self.assertIsNone(self.model.next_word(['c']))
+        self.assertIsNone(self.model.next_word(['unseen']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from collections import Counter
+from database import MIGRATIONS, SCHEMA_VERSION, WordDatabase, _encode_training_text, content_hash
+from memory_store import MemoryWordStore
+from storage import INCOMPLETE_OCCURRENCES, LABEL_REVISION, UNTRACKED_COUNTS
+from text_processor import TextProcessor, Tokenizer
+
+TEXT = "The cat sat on the mat. The dog sat on the log."
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'words.db')
+    
+    def create_database(self, version: int) -> sqlite3.Connection:
+        """Create a database as it was at the given schema version."""
+        conn = sqlite3.connect(self.path)
+        for migration in MIGRATIONS[:version]:
+            migration(conn.cursor())
+        conn.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+        return conn
+    
+    def schema_version(self) -> int:
+        """Read the schema version of the database file."""
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def learn_version_6(self, conn: sqlite3.Connection, text: str, streamed: str = ''):
+        """Learn a stored text, and optionally a streamed one, as version 6 did."""
+        tokenizer = Tokenizer()
+        content, compressed = _encode_training_text(text)
+        conn.execute('INSERT INTO training_texts (text_content, content_hash, compressed) VALUES (?, ?, ?)',
+                     (content, content_hash(text), compressed))
+        sequences = Counter()
+        for learned in (text, streamed):
+            words = tokenizer.tokenize(learned).words
+            conn.executemany("INSERT OR IGNORE INTO words (word, is_valid, learned_from) VALUES (?, 1, 'text_learning')",
+                             ((word,) for word in words))
+            sequences.update(zip(words, words[1:]))
+        conn.executemany('INSERT INTO word_sequences (word1, word2, frequency) VALUES (?, ?, ?)',
+                         ((word1, word2, frequency) for (word1, word2), frequency in sequences.items()))
+        conn.commit()
+        conn.close()
+    
+    def test_new_database_is_current(self):
+        WordDatabase(self.path).close()
+        self.assertEqual(self.schema_version(), SCHEMA_VERSION)
+    
+    def test_upgrade_from_every_version(self):
+        for version in range(1, SCHEMA_VERSION):
+            with self.subTest(version=version):
+                self.create_database(version).close()
+                with WordDatabase(self.path) as db:
+                    self.assertTrue(db.add_word('hello', True))
+                    self.assertEqual(db.get_word('hello'), ('hello', True, 'guessing'))
+                self.assertEqual(self.schema_version(), SCHEMA_VERSION)
+                os.remove(self.path)
+    
+    def test_upgrade_backfills_occurrences(self):
+        self.learn_version_6(self.create_database(6), TEXT)
+        store = MemoryWordStore.load(self.path)
+        self.assertEqual(sorted(store.get_words_by_occurrences(1)),
+                         sorted(Counter(Tokenizer().tokenize(TEXT).words).items()))
+        self.assertEqual(store.get_metadata(UNTRACKED_COUNTS), 0)
+        self.assertEqual(store.get_metadata(INCOMPLETE_OCCURRENCES), 0)
+        
+        # Complete counts let unlearning forget the text entirely
+        text_id, _, _ = next(store.iter_training_texts())
+        self.assertIsNone(store.get_training_text_order(text_id))
+        TextProcessor(store, ngram_order=2).unlearn_text(text_id)
+        self.assertEqual(store.get_all_words(), [])
+        self.assertEqual(list(store.iter_word_sequences()), [])
+    
+    def test_upgrade_flags_streamed_counts(self):
+        self.learn_version_6(self.create_database(6), TEXT, streamed="The cat ran home.")
+        store = MemoryWordStore.load(self.path)
+        self.assertEqual(store.get_metadata(UNTRACKED_COUNTS), 1)
+        self.assertEqual(store.get_metadata(INCOMPLETE_OCCURRENCES), 1)
+        self.assertFalse(TextProcessor(store).rebuild()['rebuilt'])
+        
+        # Words that may still be in streamed text survive unlearning
+        text_id, _, _ = next(store.iter_training_texts())
+        TextProcessor(store, ngram_order=2).unlearn_text(text_id)
+        self.assertIsNotNone(store.get_word('cat'))
+        self.assertEqual(sorted(store.iter_word_sequences()), [('cat', 'ran', 1), ('ran', 'home', 1), ('the', 'cat', 1)])
+    
+    def test_upgrade_orders_label_revisions_by_id(self):
+        self.learn_version_6(self.create_database(6), TEXT)
+        with WordDatabase(self.path) as db:
+            changes = list(db.iter_label_changes())
+            rows = sorted(db.export_rows()['words'])
+            self.assertEqual([word for _, word, _ in changes], [row[1] for row in rows])
+            self.assertEqual(db.get_metadata(LABEL_REVISION), changes[-1][0])
+            
+            # Relabeling moves a word to the end, adding a word comes after it
+            db.add_word('cat', False)
+            db.add_word('zebra', True)
+            self.assertEqual([word for _, word, _ in db.iter_label_changes(changes[-1][0])], ['cat', 'zebra'])
+
+if __name__ == '__main__':
+    unittest.main()
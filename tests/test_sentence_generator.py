@@ -0,0 +1,46 @@
+import unittest
+from sentence_generator import SentenceGenerator
+from text_processor import TextProcessor
+from .stores import DatabaseStoreMixin, MemoryStoreMixin
+
+TEXT = "The cat sat on the mat. The dog sat on the log, and the cat watched the dog."
+SENTENCES = ['the cat sat on the mat', 'the dog sat', 'cat watched the dog', 'purple elephants dance']
+
+class BigramCacheTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.processor = TextProcessor(self.store)
+        self.processor.learn_from_text(TEXT)
+        self.generator = SentenceGenerator(self.store)
+    
+    def test_batch_matches_single_sentences(self):
+        self.assertEqual(self.generator.analyze_sentences(SENTENCES),
+                         [SentenceGenerator(self.store).analyze_sentence_quality(s) for s in SENTENCES])
+    
+    def test_cache_follows_sequence_changes(self):
+        before = self.generator.analyze_sentence_quality('purple elephants dance')
+        self.assertIn(('purple', 'elephants'), self.generator._bigram_cache)
+        self.processor.learn_from_text("Purple elephants dance all night.")
+        after = self.generator.analyze_sentence_quality('purple elephants dance')
+        self.assertGreater(after['coherence_score'], before['coherence_score'])
+        self.assertEqual(self.generator._get_bigram_frequencies([('purple', 'elephants')]),
+                         {('purple', 'elephants'): 1})
+        self.store.clear_counts()
+        self.assertEqual(self.generator._get_bigram_frequencies([('purple', 'elephants')]),
+                         {('purple', 'elephants'): 0})
+    
+    def test_cache_is_bounded(self):
+        self.generator.bigram_cache_size = 3
+        self.generator.analyze_sentences(SENTENCES)
+        self.assertEqual(len(self.generator._bigram_cache), 3)
+        self.assertEqual(self.generator.analyze_sentences(SENTENCES),
+                         SentenceGenerator(self.store).analyze_sentences(SENTENCES))
+
+class MemoryBigramCacheTest(MemoryStoreMixin, BigramCacheTests, unittest.TestCase):
+    pass
+
+class DatabaseBigramCacheTest(DatabaseStoreMixin, BigramCacheTests, unittest.TestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import unittest
+from memory_store import MemoryWordStore
+from sentence_generator import SentenceGenerator
+from server import SentenceServer
+from text_processor import TextProcessor
+
+class RequestParsingTest(unittest.TestCase):
+    def setUp(self):
+        store = MemoryWordStore()
+        TextProcessor(store).learn_from_text("The cat sat on the mat. The dog sat on the log.")
+        self.server = SentenceServer(SentenceGenerator(store), workers=1)
+        self.addCleanup(self.server.executor.shutdown)
+    
+    def request(self, raw: bytes):
+        """Send one raw request to a fresh connection; returns (status code, JSON body)."""
+        async def exchange():
+            listener = await asyncio.start_server(self.server._handle_connection, '127.0.0.1', 0)
+            async with listener:
+                reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+                writer.write(raw)
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+            return response
+        head, _, body = asyncio.run(exchange()).partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body)
+    
+    def post(self, path: str, body: bytes, length: str) -> tuple:
+        return self.request(f"POST {path} HTTP/1.1\r\nContent-Length: {length}\r\nConnection: close\r\n\r\n"
+                            .encode('latin-1') + body)
+    
+    def test_analyze(self):
+        body = json.dumps({'sentence': 'the cat sat'}).encode('utf-8')
+        status, payload = self.post('/analyze', body, str(len(body)))
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['word_count'], 3)
+    
+    def test_invalid_content_length(self):
+        for length in ('-1', 'abc', '1.5'):
+            with self.subTest(length=length):
+                status, payload = self.post('/analyze', b'{}', length)
+                self.assertEqual(status, 400)
+                self.assertEqual(payload, {'error': "Invalid Content-Length"})
+    
+    def test_body_too_large(self):
+        status, _ = self.post('/analyze', b'', str(1 << 30))
+        self.assertEqual(status, 413)
+
+if __name__ == '__main__':
+    unittest.main()
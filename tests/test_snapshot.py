@@ -0,0 +1,82 @@
+import os
+import random
+import tempfile
+import unittest
+from markov_model import TransitionModel
+from memory_store import MemoryWordStore
+from sentence_generator import SentenceGenerator
+from text_processor import TextProcessor
+
+TEXT = ("The cat sat on the mat. The dog sat on the log, and the cat watched the dog. "
+        "A bird sang while the dog slept on the warm mat.")
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.store = MemoryWordStore()
+        TextProcessor(self.store, ngram_order=3).learn_from_text(TEXT)
+        self.store.add_word('lonely', True)
+        self.store.add_word('sang', False)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'model.snapshot')
+        self.model = TransitionModel.from_database(self.store, vocabulary=True)
+        self.model.save_snapshot(self.path)
+        self.snapshot = TransitionModel.from_snapshot(self.path)
+    
+    def test_round_trip_matches_model(self):
+        self.assertEqual(list(self.snapshot.words), list(self.model.words))
+        self.assertEqual(self.snapshot.orders, self.model.orders)
+        for order, table in self.model.tables.items():
+            loaded = self.snapshot.tables[order]
+            self.assertEqual([list(level) for level in loaded.offsets], [list(level) for level in table.offsets])
+            self.assertEqual([list(level) for level in loaded.keys], [list(level) for level in table.keys])
+            self.assertEqual(list(loaded.targets), list(table.targets))
+            self.assertEqual(list(loaded.cumulative), list(table.cumulative))
+        for word in self.model.words:
+            self.assertEqual(self.snapshot.word_id(word), self.model.word_id(word))
+        self.assertIsNone(self.snapshot.word_id('unseen'))
+    
+    def test_round_trip_samples_the_same(self):
+        for history in (['the'], ['the', 'cat'], ['sat', 'on'], ['unseen']):
+            self.assertEqual(self.snapshot.next_word(history, random.Random(7)),
+                             self.model.next_word(history, random.Random(7)))
+    
+    def test_vocabulary_round_trips(self):
+        vocabulary = self.snapshot.vocabulary
+        self.assertEqual(len(vocabulary), len(self.store.vocabulary))
+        self.assertIn('lonely', vocabulary)
+        self.assertNotIn('sang', vocabulary)
+        self.assertNotIn('unseen', vocabulary)
+        self.assertEqual(vocabulary.start_word_count, self.store.get_start_word_count())
+        self.assertEqual(sorted(vocabulary.start_words()), sorted(self.store.get_start_words()))
+    
+    def test_generator_needs_no_database(self):
+        generator = SentenceGenerator(MemoryWordStore(), self.snapshot)
+        sentence = generator.generate_sentence()
+        self.assertNotIn("No words learned yet", sentence)
+        self.assertEqual(len(list(generator.iter_sentences(5))), 5)
+        self.assertTrue(generator.generate_sentence_with_seed('cat').startswith('Cat'))
+        self.assertIn("not found", generator.generate_sentence_with_seed('sang'))
+    
+    def test_frequencies_match_database(self):
+        pairs = [('the', 'cat'), ('sat', 'on'), ('on', 'the'), ('cat', 'the'), ('the', 'unseen')]
+        found = self.store.get_sequence_frequencies(pairs)
+        for pair in pairs:
+            self.assertEqual(self.snapshot.frequency(pair), found.get(pair, 0))
+        self.assertEqual(self.snapshot.frequency(('sat', 'on', 'the')),
+                         dict(self.store.iter_ngrams(3)).get(('sat', 'on', 'the'), 0))
+    
+    def test_analysis_reads_the_model(self):
+        scored = SentenceGenerator(self.store).analyze_sentence_quality('the cat sat on the mat')
+        generator = SentenceGenerator(MemoryWordStore(), self.snapshot)
+        self.assertEqual(generator.analyze_sentence_quality('the cat sat on the mat'), scored)
+    
+    def test_model_without_vocabulary_uses_database(self):
+        TransitionModel.from_database(self.store).save_snapshot(self.path)
+        snapshot = TransitionModel.from_snapshot(self.path)
+        self.assertIsNone(snapshot.vocabulary)
+        generator = SentenceGenerator(self.store, snapshot)
+        self.assertIs(generator.vocabulary, self.store.vocabulary)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from text_processor import TextProcessor
+from .stores import DatabaseStoreMixin, MemoryStoreMixin
+
+TEXT_A = "The cat sat on the mat. The dog sat on the log, and the cat watched the dog."
+TEXT_B = "A cat and a dog met on the mat. The cat ran home before the dog did."
+
+class StatisticsTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.processor = TextProcessor(self.store, ngram_order=4)
+    
+    def counted(self):
+        """The statistics counted from the stored rows."""
+        words = self.store.get_all_words()
+        valid_words = sum(1 for _, is_valid, _ in words if is_valid)
+        return {
+            'total_words': len(words),
+            'valid_words': valid_words,
+            'invalid_words': len(words) - valid_words,
+            'training_texts': len(list(self.store.iter_training_texts())),
+            'word_sequences': len(list(self.store.iter_word_sequences())),
+            'word_ngrams': sum(len(list(self.store.iter_ngrams(n)))
+                               for n in range(3, self.store.get_max_ngram_order() + 1)),
+        }
+    
+    def assert_statistics_match(self):
+        self.assertEqual(self.store.get_statistics(), self.counted())
+    
+    def test_statistics_follow_every_change(self):
+        self.assert_statistics_match()
+        self.store.add_word('zyx', False)
+        self.store.add_words_bulk(['cat', 'qwe'], True)
+        self.assert_statistics_match()
+        self.store.add_word('zyx', True)
+        self.store.add_word('qwe', False)
+        self.assert_statistics_match()
+        self.processor.learn_from_text(TEXT_A, 'a')
+        self.processor.learn_from_text(TEXT_B, 'b')
+        self.assert_statistics_match()
+        text_id, = self.store.get_training_text_ids('b')
+        self.processor.unlearn_text(text_id)
+        self.assert_statistics_match()
+        self.processor.learn_from_documents([[TEXT_B]])
+        self.assert_statistics_match()
+        self.processor.rebuild()
+        self.assert_statistics_match()
+        self.store.import_rows(self.store.export_rows())
+        self.assert_statistics_match()
+        self.store.clear_counts()
+        self.assert_statistics_match()
+        self.store.clear_database()
+        self.assert_statistics_match()
+        self.assertEqual(set(self.store.get_statistics().values()), {0})
+
+class MemoryStatisticsTest(MemoryStoreMixin, StatisticsTests, unittest.TestCase):
+    pass
+
+class DatabaseStatisticsTest(DatabaseStoreMixin, StatisticsTests, unittest.TestCase):
+    def test_statistics_match_table_counts(self):
+        self.processor.learn_from_text(TEXT_A, 'a')
+        self.store.add_word('zyx', False)
+        cursor = self.store._connect().cursor()
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM words), (SELECT COUNT(*) FROM words WHERE is_valid = 1),
+                   (SELECT COUNT(*) FROM training_texts), (SELECT COUNT(*) FROM word_sequences),
+                   (SELECT COUNT(*) FROM word_ngrams)
+        ''')
+        total, valid, texts, sequences, ngrams = cursor.fetchone()
+        self.assertEqual(self.store.get_statistics(), {
+            'total_words': total, 'valid_words': valid, 'invalid_words': total - valid,
+            'training_texts': texts, 'word_sequences': sequences, 'word_ngrams': ngrams,
+        })
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from memory_store import MemoryWordStore
+from text_processor import TextProcessor
+from .stores import counts
+
+TEXT_A = "The cat sat on the mat. The dog sat on the log, and the cat watched the dog."
+TEXT_B = "A cat and a dog met on the mat. The cat ran home before the dog did."
+DOCUMENTS = [
+    ["The quick brown fox jumps over ", "the lazy dog. The dog sleeps ", "while the fox runs away."],
+    ["Every morning the baker opens ", "the shop and the first customers ", "buy bread before work."],
+    ["the lazy dog wakes up when the baker ", "walks past the shop."],
+]
+
+class ParallelIngestTest(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        serial, parallel = MemoryWordStore(), MemoryWordStore()
+        TextProcessor(serial, ngram_order=4).learn_from_documents(DOCUMENTS, batch_size=5)
+        results = TextProcessor(parallel, ngram_order=4).learn_from_documents_parallel(
+            DOCUMENTS, workers=2, batch_size=5)
+        self.assertEqual(results['documents'], len(DOCUMENTS))
+        self.assertEqual(counts(parallel), counts(serial))
+    
+    def test_parallel_rebuild_matches_serial(self):
+        serial, parallel = MemoryWordStore(), MemoryWordStore()
+        for store in (serial, parallel):
+            processor = TextProcessor(store)
+            processor.learn_from_text(TEXT_A, 'a')
+            processor.learn_from_text(TEXT_B, 'b')
+        TextProcessor(serial).rebuild(workers=1)
+        TextProcessor(parallel).rebuild(workers=2)
+        self.assertEqual(counts(parallel), counts(serial))
+
+class NgramOrderTest(unittest.TestCase):
+    def test_order_below_bigrams_is_rejected(self):
+        for order in (1, 0, -3):
+            with self.assertRaises(ValueError):
+                TextProcessor(MemoryWordStore(), order)
+    
+    def test_bigrams_only(self):
+        store = MemoryWordStore()
+        TextProcessor(store, 2).learn_from_documents([[TEXT_A]])
+        self.assertEqual(store.get_max_ngram_order(), 2)
+        self.assertEqual(store.get_sequence_frequencies([('the', 'cat')]), {('the', 'cat'): 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import random
+import re
+import string
+import unittest
+from text_processor import Tokenizer
+
+def reference_clean_text(text):
+    """The original regex-based TextProcessor.clean_text."""
+    text = text.lower()
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,!?]', '', text)
+    return text.strip()
+
+def reference_words(text):
+    """The original TextProcessor.extract_words."""
+    cleaned_text = reference_clean_text(text)
+    words = [word.strip() for word in cleaned_text.split() if word.strip()]
+    words = [word.strip(string.punctuation) for word in words]
+    return [word for word in words if len(word) >= 2]
+
+def reference_sentences(text):
+    """The original TextProcessor.extract_sentences."""
+    sentences = re.split(r'[.!?]+', reference_clean_text(text))
+    return [s.strip() for s in sentences if s.strip()]
+
+class TokenizerTest(unittest.TestCase):
+    ALPHABET = 'abAB éß1_ .,!?;:\'"-()\t\n\x0b\x1c\u00a0\u2003@#'
+    
+    def assert_matches_reference(self, text):
+        tokens = Tokenizer().tokenize(text)
+        self.assertEqual(tokens.words, reference_words(text), repr(text))
+        self.assertEqual(tokens.sentences, reference_sentences(text), repr(text))
+    
+    def test_edge_cases(self):
+        for text in ('', '   ', '...', 'a', 'Hi.', 'Hello, World! How are you?',
+                     'one.two..three?!four', '  spaced   out \n\n text  ', 'ends with dots...',
+                     '@@ ## tokens of symbols only', "it's a dog's life -- isn't it?",
+                     'Ünïcödé wörds ünd straße.', 'tabs\tand\nnewlines\r\nmixed',
+                     'x. y! z? .leading', 'a_b c_d __ _', '3.14 is pi, 2.71 is e.'):
+            with self.subTest(text=text):
+                self.assert_matches_reference(text)
+    
+    def test_random_text(self):
+        rng = random.Random(9)
+        for _ in range(2000):
+            self.assert_matches_reference(''.join(rng.choice(self.ALPHABET) for _ in range(rng.randint(0, 40))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import sqlite3
+import unittest
+from text_processor import TextProcessor
+from .stores import DatabaseStoreMixin, MemoryStoreMixin, counts
+
+TEXT = "The cat sat on the mat. The dog sat on the log."
+
+class TrainingTextTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.processor = TextProcessor(self.store)
+    
+    def test_repeated_text_is_skipped(self):
+        self.assertFalse(self.processor.learn_from_text(TEXT)['duplicate'])
+        before = counts(self.store)
+        self.assertTrue(self.processor.learn_from_text(TEXT)['duplicate'])
+        self.assertTrue(self.processor.learn_from_text(TEXT, 'other')['duplicate'])
+        self.assertEqual(counts(self.store), before)
+        self.assertEqual(len(list(self.store.iter_training_texts())), 1)
+    
+    def test_unchanged_sources_are_skipped(self):
+        texts = [('a', TEXT), ('b', "A bird flew over the log.")]
+        self.assertEqual(self.processor.learn_from_sources(texts), {'learned': 2, 'skipped': 0})
+        self.assertEqual(self.processor.learn_from_sources(texts), {'learned': 0, 'skipped': 2})
+    
+    def test_long_text_round_trips(self):
+        text = ' '.join(f"word{i} follows." for i in range(2000))
+        self.processor.learn_from_text(text, 'long')
+        text_id, = self.store.get_training_text_ids('long')
+        self.assertEqual(self.store.get_training_text(text_id), text)
+        self.assertTrue(self.store.has_training_text(text))
+
+class MemoryTrainingTextTest(MemoryStoreMixin, TrainingTextTests, unittest.TestCase):
+    pass
+
+class DatabaseTrainingTextTest(DatabaseStoreMixin, TrainingTextTests, unittest.TestCase):
+    def test_failed_write_stores_nothing(self):
+        # Fail the last write of the transaction, after the text, words and sequences
+        conn = sqlite3.connect(self.store.db_path)
+        self.addCleanup(conn.close)
+        with conn:
+            conn.execute("CREATE TRIGGER fail BEFORE INSERT ON word_ngrams BEGIN SELECT RAISE(ABORT, 'full'); END")
+        with self.assertRaises(sqlite3.Error):
+            self.processor.learn_from_text(TEXT)
+        self.assertFalse(self.store.has_training_text(TEXT))
+        self.assertEqual(self.store.get_all_words(), [])
+        self.assertEqual(list(self.store.iter_word_sequences()), [])
+        
+        # The text isn't taken for a duplicate once writes succeed again
+        with conn:
+            conn.execute('DROP TRIGGER fail')
+        self.assertFalse(self.processor.learn_from_text(TEXT)['duplicate'])
+        self.assertNotEqual(list(self.store.iter_word_sequences()), [])
+
+if __name__ == '__main__':
+    unittest.main()
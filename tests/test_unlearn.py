@@ -0,0 +1,121 @@
+import unittest
+from storage import INCOMPLETE_OCCURRENCES, UNTRACKED_COUNTS
+from text_processor import TextProcessor
+from .stores import DatabaseStoreMixin, MemoryStoreMixin, counts
+
+TEXT_A = "The cat sat on the mat. The dog sat on the log, and the cat watched the dog."
+TEXT_B = "A cat and a dog met on the mat. The cat ran home before the dog did."
+
+class UnlearnTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.processor = TextProcessor(self.store)
+    
+    def test_unlearn_restores_counts(self):
+        self.processor.learn_from_text(TEXT_A, 'a')
+        before = counts(self.store)
+        self.processor.learn_from_text(TEXT_B, 'b')
+        text_id, = self.store.get_training_text_ids('b')
+        results = self.processor.unlearn_text(text_id)
+        self.assertTrue(results['removed'])
+        self.assertEqual(counts(self.store), before)
+        self.assertIsNone(self.store.get_word('ran'))
+        self.assertIsNone(self.store.get_training_text(text_id))
+    
+    def test_unlearn_missing_text(self):
+        self.assertEqual(self.processor.unlearn_text(42), {'removed': False, 'sequences_removed': 0})
+    
+    def test_unlearn_keeps_words_with_incomplete_occurrences(self):
+        self.processor.learn_from_text(TEXT_A, 'a')
+        self.store.set_metadata(INCOMPLETE_OCCURRENCES, 1)
+        text_id, = self.store.get_training_text_ids('a')
+        self.processor.unlearn_text(text_id)
+        self.assertEqual(list(self.store.iter_word_sequences()), [])
+        self.assertIsNotNone(self.store.get_word('cat'))
+    
+    def test_unlearn_keeps_labeled_words(self):
+        self.store.add_word('cat', True)
+        self.processor.learn_from_text(TEXT_B, 'b')
+        self.store.add_word('ran', False)
+        text_id, = self.store.get_training_text_ids('b')
+        self.processor.unlearn_text(text_id)
+        self.assertEqual(self.store.get_word('ran'), ('ran', False, 'guessing'))
+        self.assertIsNone(self.store.get_word('home'))
+    
+    def test_unlearn_uses_recorded_order(self):
+        TextProcessor(self.store, ngram_order=4).learn_from_text(TEXT_A, 'a')
+        text_id, = self.store.get_training_text_ids('a')
+        self.assertEqual(self.store.get_training_text_order(text_id), 4)
+        TextProcessor(self.store, ngram_order=2).unlearn_text(text_id)
+        self.assertEqual(counts(self.store), {'sequences': [], 'ngrams': {3: [], 4: []}, 'occurrences': []})
+    
+    def test_changed_source_replaces_previous_version(self):
+        self.processor.learn_from_text(TEXT_A, 'notes')
+        self.processor.learn_from_text(TEXT_B, 'notes')
+        expected = self.make_store()
+        TextProcessor(expected).learn_from_text(TEXT_B, 'notes')
+        self.assertEqual(counts(self.store), counts(expected))
+        self.assertEqual(len(self.store.get_training_text_ids('notes')), 1)
+
+class RebuildTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.processor = TextProcessor(self.store)
+        self.processor.learn_from_text(TEXT_A, 'a')
+    
+    def test_rebuild_matches_learning(self):
+        self.processor.learn_from_text(TEXT_B, 'b')
+        before = counts(self.store)
+        results = self.processor.rebuild()
+        self.assertTrue(results['rebuilt'])
+        self.assertEqual(results['documents'], 2)
+        self.assertEqual(counts(self.store), before)
+    
+    def test_rebuild_keeps_labels(self):
+        self.store.add_word('cat', False)
+        self.store.add_word('mat', True, 'guessing')
+        self.assertTrue(self.processor.rebuild()['rebuilt'])
+        self.assertEqual(self.store.get_word('cat'), ('cat', False, 'guessing'))
+        self.assertEqual(self.store.get_word('mat'), ('mat', True, 'guessing'))
+        self.assertNotIn('cat', self.store.vocabulary)
+        
+        # Unlearning after the rebuild still keeps the labeled words
+        text_id, = self.store.get_training_text_ids('a')
+        self.processor.unlearn_text(text_id)
+        self.assertEqual(self.store.get_word('cat'), ('cat', False, 'guessing'))
+        self.assertIsNone(self.store.get_word('dog'))
+    
+    def test_rebuild_refuses_untracked_counts(self):
+        self.processor.learn_from_documents([[TEXT_B]])
+        self.assertEqual(self.store.get_metadata(UNTRACKED_COUNTS), 1)
+        before = counts(self.store)
+        self.assertFalse(self.processor.rebuild()['rebuilt'])
+        self.assertEqual(counts(self.store), before)
+    
+    def test_forced_rebuild_drops_untracked_counts(self):
+        expected = counts(self.store)
+        self.processor.learn_from_documents([[TEXT_B]])
+        self.assertTrue(self.processor.rebuild(force=True)['rebuilt'])
+        self.assertEqual(counts(self.store), expected)
+        self.assertEqual(self.store.get_metadata(UNTRACKED_COUNTS), 0)
+    
+    def test_rebuild_records_order(self):
+        text_id, = self.store.get_training_text_ids('a')
+        TextProcessor(self.store, ngram_order=4).rebuild()
+        self.assertEqual(self.store.get_training_text_order(text_id), 4)
+        self.assertNotEqual(counts(self.store)['ngrams'][4], [])
+
+class MemoryUnlearnTest(MemoryStoreMixin, UnlearnTests, unittest.TestCase):
+    pass
+
+class DatabaseUnlearnTest(DatabaseStoreMixin, UnlearnTests, unittest.TestCase):
+    pass
+
+class MemoryRebuildTest(MemoryStoreMixin, RebuildTests, unittest.TestCase):
+    pass
+
+class DatabaseRebuildTest(DatabaseStoreMixin, RebuildTests, unittest.TestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from text_processor import TextProcessor
+from word_generator import CharacterModel, WordGenerator
+from .stores import DatabaseStoreMixin, MemoryStoreMixin
+
+def trained_counts(words):
+    """The counts of a CharacterModel trained from scratch on words."""
+    model = CharacterModel()
+    model.add_words(words)
+    return model.counts
+
+class WordGeneratorLearningTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.generator = WordGenerator(seed=1)
+    
+    def assert_learned(self, words):
+        self.generator.learn_from_database(self.store)
+        self.assertEqual(self.generator.character_model.counts, trained_counts(words))
+        self.assertEqual(len(self.generator.character_model), len(words))
+    
+    def test_learns_new_labels_incrementally(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.store.add_word('xqz', False)
+        self.assertEqual(self.generator.learn_from_database(self.store), 2)
+        self.store.add_word('bird', True)
+        self.assertEqual(self.generator.learn_from_database(self.store), 1)
+        self.assertEqual(self.generator.learn_from_database(self.store), 0)
+        self.assert_learned(['cat', 'dog', 'bird'])
+    
+    def test_follows_relabeling(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.generator.learn_from_database(self.store)
+        self.store.add_word('dog', False)
+        self.store.add_word('xqz', True)
+        self.assert_learned(['cat', 'xqz'])
+    
+    def test_forgets_cleared_words(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.generator.learn_words(['manual'])
+        self.generator.learn_from_database(self.store)
+        self.store.clear_database()
+        self.store.add_word('bird', True)
+        self.assert_learned(['manual', 'bird'])
+    
+    def test_forgets_unlearned_words(self):
+        processor = TextProcessor(self.store)
+        processor.learn_from_text("The cat sat on the mat.", 'a')
+        processor.learn_from_text("The dog ran.", 'b')
+        self.generator.learn_from_database(self.store)
+        text_id, = self.store.get_training_text_ids('b')
+        processor.unlearn_text(text_id)
+        self.assertIsNone(self.store.get_word('dog'))
+        self.assert_learned(['the', 'cat', 'sat', 'on', 'mat'])
+    
+    def test_import_starts_over(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.generator.learn_from_database(self.store)
+        other = MemoryStoreMixin().make_store()
+        other.add_word('bird', True)
+        self.store.import_rows(other.export_rows())
+        self.assert_learned(['bird'])
+
+class MemoryWordGeneratorTest(MemoryStoreMixin, WordGeneratorLearningTests, unittest.TestCase):
+    pass
+
+class DatabaseWordGeneratorTest(DatabaseStoreMixin, WordGeneratorLearningTests, unittest.TestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
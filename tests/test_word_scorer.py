@@ -0,0 +1,62 @@
+import unittest
+from text_processor import TextProcessor
+from word_scorer import WordScorer
+from .stores import DatabaseStoreMixin, MemoryStoreMixin
+
+class WordScorerLearningTests:
+    def setUp(self):
+        self.store = self.make_store()
+        self.scorer = WordScorer()
+    
+    def assert_learned(self, valid, invalid):
+        self.scorer.learn_from_database(self.store)
+        expected = WordScorer()
+        expected.add_words(valid, True)
+        expected.add_words(invalid, False)
+        self.assertEqual(+self.scorer.valid_counts, expected.valid_counts)
+        self.assertEqual(+self.scorer.invalid_counts, expected.invalid_counts)
+        self.assertEqual(len(self.scorer), len(valid) + len(invalid))
+        self.assertEqual(self.scorer.score_words(['cat', 'zzq']), expected.score_words(['cat', 'zzq']))
+    
+    def test_learns_new_labels_incrementally(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.assertEqual(self.scorer.learn_from_database(self.store), 2)
+        self.store.add_word('xqz', False)
+        self.assertEqual(self.scorer.learn_from_database(self.store), 1)
+        self.assertEqual(self.scorer.learn_from_database(self.store), 0)
+        self.assert_learned(['cat', 'dog'], ['xqz'])
+    
+    def test_follows_relabeling(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.store.add_word('xqz', False)
+        self.scorer.learn_from_database(self.store)
+        self.store.add_word('dog', False)
+        self.store.add_word('xqz', True)
+        self.assert_learned(['cat', 'xqz'], ['dog'])
+    
+    def test_forgets_cleared_words(self):
+        self.store.add_words_bulk(['cat', 'dog'], True)
+        self.store.add_word('xqz', False)
+        self.scorer.learn_from_database(self.store)
+        self.store.clear_database()
+        self.store.add_word('zzq', False)
+        self.assert_learned([], ['zzq'])
+    
+    def test_forgets_unlearned_words(self):
+        processor = TextProcessor(self.store)
+        processor.learn_from_text("The cat sat.", 'a')
+        processor.learn_from_text("The dog ran.", 'b')
+        self.store.add_word('xqz', False)
+        self.scorer.learn_from_database(self.store)
+        text_id, = self.store.get_training_text_ids('b')
+        processor.unlearn_text(text_id)
+        self.assert_learned(['the', 'cat', 'sat'], ['xqz'])
+
+class MemoryWordScorerTest(MemoryStoreMixin, WordScorerLearningTests, unittest.TestCase):
+    pass
+
+class DatabaseWordScorerTest(DatabaseStoreMixin, WordScorerLearningTests, unittest.TestCase):
+    pass
+
+if __name__ == '__main__':
+    unittest.main()
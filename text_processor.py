@@ -1,12 +1,190 @@
+import os
 import re
 import string
-from typing import List, Tuple
-from database import WordDatabase
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+from storage import UNTRACKED_COUNTS, WordStore
+
+def iter_text_chunks(stream: TextIO, chunk_size: int = 1 << 20) -> Iterator[str]:
+    """Read a text stream in chunks that end on whitespace, so no word is split."""
+    pending = ''
+    while True:
+        block = stream.read(chunk_size)
+        if not block:
+            break
+        block = pending + block
+        if block[-1].isspace():
+            pending = ''
+            yield block
+            continue
+        # Hold back the trailing partial word until the next read
+        parts = block.rsplit(None, 1)
+        if len(parts) == 2:
+            pending = parts[1]
+            yield parts[0]
+        else:
+            pending = block
+    if pending:
+        yield pending
+
+class TokenizedText:
+    """The words and sentences of one text, produced by a single Tokenizer pass."""
+    
+    def __init__(self, words: List[str], sentences: List[str]):
+        self.words = words
+        self.sentences = sentences
+    
+    def ngrams(self, n: int) -> List[Tuple[str, ...]]:
+        """Get the n-grams of consecutive words."""
+        return list(zip(*(self.words[offset:] for offset in range(n))))
+    
+    def ngram_counts(self, ngram_order: int) -> Dict[int, Counter]:
+        """Count the 2- to ngram_order-grams."""
+        return count_ngrams(self.words, ngram_order)
+
+class Tokenizer:
+    """Splits text into words and sentences in one pass with precompiled patterns.
+    
+    Produces the same words and sentences as TextProcessor.clean_text followed
+    by splitting on whitespace and on sentence-ending punctuation.
+    """
+    
+    special_characters = re.compile(r'[^\w\s.,!?]')
+    sentence_end = re.compile(r'[.!?]+')
+    
+    def tokenize(self, text: str) -> TokenizedText:
+        """Split text into words of 2+ characters and non-empty sentences."""
+        # Collapse whitespace first, as clean_text does, so that a token made only of
+        # special characters leaves the same double space inside its sentence
+        cleaned_text = self.special_characters.sub('', ' '.join(text.lower().split()))
+        punctuation = string.punctuation
+        split_sentence = self.sentence_end.split
+        words = []
+        sentences = []
+        current_sentence = []
+        
+        def end_sentence():
+            sentence = ' '.join(current_sentence).strip()
+            if sentence:
+                sentences.append(sentence)
+            current_sentence.clear()
+        
+        for token in cleaned_text.split(' '):
+            word = token.strip(punctuation)
+            if len(word) >= 2:
+                words.append(word)
+            
+            if '.' not in token and '!' not in token and '?' not in token:
+                current_sentence.append(token)
+                continue
+            
+            # The token ends one or more sentences
+            parts = split_sentence(token)
+            for part in parts[:-1]:
+                if part:
+                    current_sentence.append(part)
+                end_sentence()
+            if parts[-1]:
+                current_sentence.append(parts[-1])
+        
+        end_sentence()
+        
+        return TokenizedText(words, sentences)
+
+# Shared by worker processes
+_TOKENIZER = Tokenizer()
+
+def count_ngrams(words: List[str], ngram_order: int, history: Sequence[str] = ()) -> Dict[int, Counter]:
+    """Count the 2- to ngram_order-grams that end inside ``words``.
+    
+    ``history`` holds the words just before ``words``, so n-grams that span
+    a chunk boundary are counted exactly once.
+    """
+    sequence = list(history) + words
+    counts = {}
+    for n in range(2, ngram_order + 1):
+        start = max(len(history) - n + 1, 0)
+        counts[n] = Counter(zip(*(sequence[start + offset:] for offset in range(n))))
+    return counts
+
+def _count_boundary_ngrams(history: List[str], head: List[str], ngram_order: int) -> Dict[int, Counter]:
+    """Count the n-grams that start in ``history`` and end in ``head``."""
+    sequence = history + head
+    counts = {}
+    for n in range(2, ngram_order + 1):
+        counts[n] = Counter(tuple(sequence[i:i + n])
+                            for i in range(max(len(history) - n + 1, 0), min(len(history), len(sequence) - n + 1)))
+    return counts
+
+def _count_chunk(chunk: str, ngram_order: int) -> tuple:
+    """Worker process entry point: count the words and n-grams of one chunk."""
+    words = _TOKENIZER.tokenize(chunk).words
+    context_length = ngram_order - 1
+    return (Counter(words), count_ngrams(words, ngram_order),
+            words[:context_length], words[-context_length:], len(words))
+
+class _CountBatch:
+    """Accumulates counts and writes them to the database every batch_size words.
+    
+    Each batch is written in one transaction, and a failed write is raised
+    to the caller, so no batch is ever half stored.
+    """
+    
+    def __init__(self, processor: 'TextProcessor', batch_size: int, progress: Optional[Callable[[dict], None]],
+                 relabel: bool = True):
+        self.processor = processor
+        self.batch_size = batch_size
+        self.progress = progress
+        self.relabel = relabel
+        self.started = time.perf_counter()
+        self.totals = {'documents': 0, 'tokens': 0, 'sequences_stored': 0, 'batches': 0}
+        self._reset()
+    
+    def _reset(self):
+        self.word_counts = Counter()
+        self.ngram_counts = {n: Counter() for n in range(2, self.processor.ngram_order + 1)}
+        self.tokens = 0
+    
+    def add(self, word_counts: Counter, ngram_counts: Dict[int, Counter], tokens: int):
+        """Merge the counts of one chunk, writing them out once the batch is full."""
+        self.word_counts.update(word_counts)
+        for n, counts in ngram_counts.items():
+            self.ngram_counts[n].update(counts)
+            self.totals['sequences_stored'] += sum(counts.values())
+        self.tokens += tokens
+        self.totals['tokens'] += tokens
+        if self.tokens >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Write the pending counts to the database."""
+        self.processor.db.add_counts(self.word_counts, self.ngram_counts, self.relabel)
+        self.totals['batches'] += 1
+        self.totals['elapsed'] = time.perf_counter() - self.started
+        self.totals['tokens_per_second'] = self.totals['tokens'] / self.totals['elapsed'] if self.totals['elapsed'] else 0
+        if self.progress:
+            self.progress(dict(self.totals))
+        self._reset()
+    
+    def finish(self) -> dict:
+        """Write whatever is left and return the totals."""
+        if self.tokens or not self.totals['batches']:
+            self.flush()
+        return self.totals
 
 class TextProcessor:
-    def __init__(self, database: WordDatabase):
+    def __init__(self, database: WordStore, ngram_order: int = 3):
         """Initialize the text processor with a database connection."""
+        if ngram_order < 2:
+            raise ValueError(f"ngram_order must be at least 2, got {ngram_order}")
         self.db = database
+        # Longest word n-grams to learn; 2 learns bigrams only
+        self.ngram_order = ngram_order
+        self.tokenizer = Tokenizer()
+        # The most recent tokenization, reused when the same text comes back
+        self._last_text = None
+        self._last_tokens = None
     
     def clean_text(self, text: str) -> str:
         """Clean and normalize text for processing."""
@@ -18,102 +196,218 @@ class TextProcessor:
         
         # Remove special characters but keep basic punctuation for sentence structure
         # Keep periods, commas, exclamation marks, question marks
-        text = re.sub(r'[^\w\s.,!?]', '', text)
+        text = Tokenizer.special_characters.sub('', text)
         
         return text.strip()
     
+    def tokenize(self, text: str) -> TokenizedText:
+        """Tokenize text once, reusing the result for repeated calls on the same text."""
+        if text is not self._last_text and text != self._last_text:
+            self._last_tokens = self.tokenizer.tokenize(text)
+            self._last_text = text
+        return self._last_tokens
+    
     def extract_words(self, text: str) -> List[str]:
         """Extract individual words from text."""
-        cleaned_text = self.clean_text(text)
-        
-        # Split by whitespace and filter out empty strings
-        words = [word.strip() for word in cleaned_text.split() if word.strip()]
-        
-        # Remove punctuation from individual words
-        words = [word.strip(string.punctuation) for word in words]
-        
-        # Filter out empty strings and very short words (less than 2 characters)
-        words = [word for word in words if len(word) >= 2]
-        
-        return words
+        return list(self.tokenize(text).words)
     
     def extract_sentences(self, text: str) -> List[str]:
         """Extract sentences from text."""
-        cleaned_text = self.clean_text(text)
-        
-        # Split by sentence-ending punctuation
-        sentences = re.split(r'[.!?]+', cleaned_text)
-        
-        # Clean and filter sentences
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        return sentences
+        return list(self.tokenize(text).sentences)
     
     def extract_word_sequences(self, text: str, n: int = 2) -> List[Tuple[str, ...]]:
         """Extract n-gram sequences from text."""
-        words = self.extract_words(text)
-        sequences = []
-        
-        for i in range(len(words) - n + 1):
-            sequence = tuple(words[i:i + n])
-            sequences.append(sequence)
-        
-        return sequences
-    
-    def learn_from_text(self, text: str) -> dict:
-        """Process text and learn words and sequences."""
-        # Store the training text
-        self.db.add_training_text(text)
-        
-        # Extract words and sequences
-        words = self.extract_words(text)
-        sentences = self.extract_sentences(text)
-        bigrams = self.extract_word_sequences(text, 2)
-        trigrams = self.extract_word_sequences(text, 3)
-        
-        # Learn individual words (assume all words from text are valid)
-        learned_words = set()
-        for word in words:
-            if len(word) >= 2:  # Only learn words with 2+ characters
-                self.db.add_word(word, True, 'text_learning')
-                learned_words.add(word)
-        
-        # Learn word sequences for Markov chain
-        learned_sequences = 0
-        for word1, word2 in bigrams:
-            if len(word1) >= 2 and len(word2) >= 2:
-                self.db.add_word_sequence(word1, word2)
-                learned_sequences += 1
-        
-        # Also learn trigrams for better sentence generation
-        for word1, word2, word3 in trigrams:
-            if len(word1) >= 2 and len(word2) >= 2 and len(word3) >= 2:
-                # Store as two bigrams: word1->word2 and word2->word3
-                self.db.add_word_sequence(word1, word2)
-                self.db.add_word_sequence(word2, word3)
-                learned_sequences += 1
+        return self.tokenize(text).ngrams(n)
+    
+    def learn_from_text(self, text: str, source: Optional[str] = None) -> dict:
+        """Process text and learn words and sequences.
+        
+        A text that was learned before is recognized by its content hash and
+        skipped, with ``duplicate`` set in the results. The text is stored
+        with its counts in one transaction, so if writing them fails the
+        error is raised and nothing is stored.
+        """
+        previous_versions = self.db.get_training_text_ids(source) if source is not None else []
+        # Check the hash first so repeats cost no tokenizing
+        duplicate = self.db.has_training_text(text)
+        if not duplicate:
+            # Tokenize once and count every n-gram order from the same words
+            tokens = self.tokenize(text)
+            words = tokens.words
+            ngram_counts = tokens.ngram_counts(self.ngram_order)
+            word_counts = Counter(words)
+            # Learn individual words (assume all words from text are valid)
+            duplicate = not self.db.add_counts(word_counts, ngram_counts, text=text, source=source,
+                                               ngram_order=self.ngram_order)
+        if duplicate:
+            return {
+                'words_learned': 0,
+                'sentences_processed': 0,
+                'bigrams_learned': 0,
+                'trigrams_learned': 0,
+                'sequences_stored': 0,
+                'unique_words': [],
+                'duplicate': True
+            }
+        learned_words = set(word_counts)
+        
+        # A changed source replaces what its earlier versions taught
+        for text_id in previous_versions:
+            self.unlearn_text(text_id)
         
         return {
             'words_learned': len(learned_words),
-            'sentences_processed': len(sentences),
-            'bigrams_learned': len(bigrams),
-            'trigrams_learned': len(trigrams),
-            'sequences_stored': learned_sequences,
-            'unique_words': list(learned_words)
+            'sentences_processed': len(tokens.sentences),
+            'bigrams_learned': max(len(words) - 1, 0),
+            'trigrams_learned': max(len(words) - 2, 0),
+            'sequences_stored': sum(sum(counts.values()) for counts in ngram_counts.values()),
+            'unique_words': list(learned_words),
+            'duplicate': False
         }
     
-    def get_word_frequency(self, text: str) -> dict:
-        """Get frequency of words in text."""
-        words = self.extract_words(text)
-        frequency = {}
+    def learn_from_sources(self, texts: Iterable[Tuple[str, str]]) -> dict:
+        """Learn (source, text) pairs, skipping texts that were learned before.
         
-        for word in words:
-            frequency[word] = frequency.get(word, 0) + 1
+        Re-sending a document set then only costs hashing the unchanged texts.
+        """
+        totals = {'learned': 0, 'skipped': 0}
+        for source, text in texts:
+            results = self.learn_from_text(text, source)
+            totals['skipped' if results['duplicate'] else 'learned'] += 1
+        return totals
+    
+    def unlearn_text(self, text_id: int) -> dict:
+        """Remove a stored training text and subtract what it taught.
         
-        return frequency
+        Only that text is tokenized again, counting the n-gram orders it was
+        learned with. This ngram_order is only used for texts stored before
+        the order was recorded.
+        """
+        text = self.db.get_training_text(text_id)
+        if text is None:
+            return {'removed': False, 'sequences_removed': 0}
+        tokens = self.tokenize(text)
+        ngram_counts = tokens.ngram_counts(self.db.get_training_text_order(text_id) or self.ngram_order)
+        removed = self.db.subtract_training_text(text_id, Counter(tokens.words), ngram_counts)
+        return {
+            'removed': removed,
+            'sequences_removed': sum(sum(counts.values()) for counts in ngram_counts.values()) if removed else 0
+        }
     
-    def get_common_words(self, text: str, min_frequency: int = 2) -> List[Tuple[str, int]]:
-        """Get words that appear frequently in text."""
+    def rebuild(self, workers: Optional[int] = 1, batch_size: int = 100000,
+                progress: Optional[Callable[[dict], None]] = None, force: bool = False) -> dict:
+        """Recount every sequence and n-gram from the stored training texts.
+        
+        ``workers`` other than 1 counts in worker processes (None or 0 for one
+        per core). Only counts are rebuilt: words keep their labels, and
+        every text is recorded as learned with this ngram_order. Counts
+        learned by learn_from_documents have no stored text to be recounted
+        from, so if there are any, nothing is changed and ``rebuilt`` is
+        False in the results, unless ``force`` is set to rebuild without them.
+        
+        The old counts are deleted before the texts are recounted, so
+        readers see partial counts until it finishes. An interrupted rebuild
+        can simply be run again.
+        """
+        if self.db.get_metadata(UNTRACKED_COUNTS) and not force:
+            return {'rebuilt': False, 'documents': 0, 'tokens': 0, 'elapsed': 0.0}
+        self.db.clear_counts()
+        documents = ([text] for _, _, text in self.db.iter_training_texts())
+        if workers == 1:
+            results = self._count_documents(documents, batch_size, progress, relabel=False)
+        else:
+            results = self._count_documents_parallel(documents, workers, batch_size, progress, relabel=False)
+        self.db.set_training_text_orders(self.ngram_order)
+        results['rebuilt'] = True
+        return results
+    
+    
+    def learn_from_documents(self, documents: Iterable[Iterable[str]], batch_size: int = 100000,
+                             progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """Learn from documents given as streams of text chunks.
+        
+        Counts are written every ``batch_size`` words, so memory use stays flat
+        however large the input is. N-grams span chunk boundaries but not
+        document boundaries. The texts are not stored in training_texts, so
+        the counts are flagged as ones rebuild can't recount.
+        """
+        self.db.set_metadata(UNTRACKED_COUNTS, 1)
+        return self._count_documents(documents, batch_size, progress)
+    
+    def _count_documents(self, documents: Iterable[Iterable[str]], batch_size: int,
+                         progress: Optional[Callable[[dict], None]], relabel: bool = True) -> dict:
+        """Count and store documents for learn_from_documents and rebuild."""
+        batch = _CountBatch(self, batch_size, progress, relabel)
+        context_length = self.ngram_order - 1
+        for chunks in documents:
+            batch.totals['documents'] += 1
+            history = []  # Last words of the previous chunk, for n-grams across chunks
+            for chunk in chunks:
+                words = self.tokenizer.tokenize(chunk).words
+                if not words:
+                    continue
+                batch.add(Counter(words), count_ngrams(words, self.ngram_order, history), len(words))
+                history = (history + words[-context_length:])[-context_length:]
+        return batch.finish()
+    
+    def learn_from_documents_parallel(self, documents: Iterable[Iterable[str]], workers: Optional[int] = None,
+                                      batch_size: int = 100000,
+                                      progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """Like learn_from_documents, but tokenize and count chunks in worker processes.
+        
+        Each worker returns local Counters for its chunk. They are merged here
+        in input order, together with the n-grams that span two chunks, so the
+        result is the same as the single-process version.
+        """
+        self.db.set_metadata(UNTRACKED_COUNTS, 1)
+        return self._count_documents_parallel(documents, workers, batch_size, progress)
+    
+    def _count_documents_parallel(self, documents: Iterable[Iterable[str]], workers: Optional[int],
+                                  batch_size: int, progress: Optional[Callable[[dict], None]],
+                                  relabel: bool = True) -> dict:
+        """Count and store documents in worker processes, for learn_from_documents_parallel and rebuild."""
+        workers = workers or os.cpu_count() or 1
+        batch = _CountBatch(self, batch_size, progress, relabel)
+        context_length = self.ngram_order - 1
+        state = {'document': None, 'history': []}
+        pending = deque()
+        
+        def merge_oldest():
+            document, future = pending.popleft()
+            word_counts, ngram_counts, head, tail, tokens = future.result()
+            if document != state['document']:
+                state['document'] = document
+                state['history'] = []
+            history = state['history']
+            for n, counts in _count_boundary_ngrams(history, head, self.ngram_order).items():
+                ngram_counts[n].update(counts)
+            state['history'] = tail if tokens >= context_length else (history + head)[-context_length:]
+            batch.add(word_counts, ngram_counts, tokens)
+        
+        # Imported here because multiprocessing is slow to import and rarely needed
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as executor:
+            for document, chunks in enumerate(documents):
+                batch.totals['documents'] += 1
+                for chunk in chunks:
+                    pending.append((document, executor.submit(_count_chunk, chunk, self.ngram_order)))
+                    # Bound the number of chunks held in memory
+                    if len(pending) >= workers * 4:
+                        merge_oldest()
+            while pending:
+                merge_oldest()
+        
+        return batch.finish()
+    
+    def get_word_frequency(self, text: str) -> dict:
+        """Get frequency of words in text."""
+        return dict(Counter(self.tokenize(text).words))
+    
+    def get_common_words(self, text: Optional[str] = None, min_frequency: int = 2) -> List[Tuple[str, int]]:
+        """Get words that appear frequently in text, or across everything learned if text is None."""
+        if text is None:
+            return self.db.get_words_by_occurrences(min_frequency)
+        
         frequency = self.get_word_frequency(text)
         common_words = [(word, freq) for word, freq in frequency.items() 
                        if freq >= min_frequency]
@@ -125,8 +419,9 @@ class TextProcessor:
     
     def analyze_text_complexity(self, text: str) -> dict:
         """Analyze the complexity of the input text."""
-        words = self.extract_words(text)
-        sentences = self.extract_sentences(text)
+        tokens = self.tokenize(text)
+        words = tokens.words
+        sentences = tokens.sentences
         
         if not words:
             return {
@@ -0,0 +1,122 @@
+import random
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+class Vocabulary:
+    """Cached set of valid words supporting O(1) membership and random picks.
+    
+    Words are interned to integer ids. The ids of the valid words are packed
+    into an array so a random word is one index away, and removing a word swaps
+    the last id into its slot. The vocabulary also tracks which words have
+    successors, keeping a running count of the valid ones (the start words).
+    """
+    
+    def __init__(self, words: Iterable[str] = (), source_words: Iterable[str] = ()):
+        """Initialize the vocabulary with the valid words and the words that have successors."""
+        self._lock = threading.Lock()
+        self.words: List[str] = []
+        self.word_ids: Dict[str, int] = {}
+        self.valid_ids = array('i')
+        # Maps each valid word id to its slot in valid_ids
+        self._positions: Dict[int, int] = {}
+        # Ids of words seen as word1 of a sequence
+        self._sources: Set[int] = set()
+        self.start_word_count = 0
+        for word in words:
+            self._add(word)
+        for word in source_words:
+            self._add_source(word)
+    
+    def __len__(self) -> int:
+        return len(self.valid_ids)
+    
+    def __contains__(self, word: str) -> bool:
+        word_id = self.word_ids.get(word)
+        return word_id is not None and word_id in self._positions
+    
+    def _intern(self, word: str) -> int:
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.words.append(word)
+            self.word_ids[word] = word_id
+        return word_id
+    
+    def _add(self, word: str):
+        word_id = self._intern(word)
+        if word_id not in self._positions:
+            self._positions[word_id] = len(self.valid_ids)
+            self.valid_ids.append(word_id)
+            if word_id in self._sources:
+                self.start_word_count += 1
+    
+    def _discard(self, word: str):
+        word_id = self.word_ids.get(word)
+        position = self._positions.pop(word_id, None)
+        if position is None:
+            return
+        if word_id in self._sources:
+            self.start_word_count -= 1
+        last_id = self.valid_ids.pop()
+        if last_id != word_id:
+            self.valid_ids[position] = last_id
+            self._positions[last_id] = position
+    
+    def _add_source(self, word: str):
+        word_id = self._intern(word)
+        if word_id not in self._sources:
+            self._sources.add(word_id)
+            if word_id in self._positions:
+                self.start_word_count += 1
+    
+    def _discard_source(self, word: str):
+        word_id = self.word_ids.get(word)
+        if word_id in self._sources:
+            self._sources.remove(word_id)
+            if word_id in self._positions:
+                self.start_word_count -= 1
+    
+    def update(self, words: Iterable[str], is_valid: bool):
+        """Mark words as valid or invalid."""
+        with self._lock:
+            for word in words:
+                if is_valid:
+                    self._add(word)
+                else:
+                    self._discard(word)
+    
+    def add_sources(self, words: Iterable[str]):
+        """Record that the words have been seen followed by another word."""
+        with self._lock:
+            for word in words:
+                self._add_source(word)
+    
+    def remove_sources(self, words: Iterable[str]):
+        """Record that the words are no longer followed by any word."""
+        with self._lock:
+            for word in words:
+                self._discard_source(word)
+    
+    def clear_sources(self):
+        """Record that no word is followed by another any more."""
+        with self._lock:
+            self._sources = set()
+            self.start_word_count = 0
+    
+    def clear(self):
+        """Forget every word."""
+        with self._lock:
+            self.words = []
+            self.word_ids = {}
+            self.valid_ids = array('i')
+            self._positions = {}
+            self._sources = set()
+            self.start_word_count = 0
+    
+    def random_word(self, rng=random) -> Optional[str]:
+        """Pick a uniformly random valid word, or None if there are none."""
+        with self._lock:
+            if not self.valid_ids:
+                return None
+            return self.words[self.valid_ids[rng.randrange(len(self.valid_ids))]]
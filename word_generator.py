@@ -1,10 +1,117 @@
 import random
 import string
-from typing import List
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from typing import Container, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from storage import LABEL_GENERATION
+
+class CharacterModel:
+    """Character n-gram model of word spelling, trained incrementally.
+    
+    Each context of ``order - 1`` characters maps to the counts of the
+    characters that follow it, with ``^`` padding the start of a word and
+    ``$`` marking its end. Cumulative tables for sampling are rebuilt only for
+    the contexts that changed since they were last used.
+    """
+    
+    START = '^'
+    END = '$'
+    
+    def __init__(self, order: int = 3):
+        """Initialize an empty model that looks at order - 1 preceding characters."""
+        self.order = order
+        self.word_count = 0
+        self.counts: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._tables: Dict[str, Tuple[List[str], List[int]]] = {}
+        self._stale: Set[str] = set()
+    
+    def __len__(self) -> int:
+        return self.word_count
+    
+    def _ngrams(self, words: Iterable[str]) -> Iterator[str]:
+        """Yield each word's padded character n-grams."""
+        order = self.order
+        padding = self.START * (order - 1)
+        for word in words:
+            padded = padding + word + self.END
+            for i in range(len(word) + 1):
+                yield padded[i:i + order]
+    
+    def add_words(self, words: Iterable[str]):
+        """Count the character transitions of more words."""
+        for ngram, count in Counter(self._ngrams(words)).items():
+            context, char = ngram[:-1], ngram[-1]
+            following = self.counts[context]
+            following[char] = following.get(char, 0) + count
+            self._stale.add(context)
+            if char == self.END:
+                self.word_count += count
+    
+    def remove_words(self, words: Iterable[str]):
+        """Stop counting the character transitions of words that were added before."""
+        for ngram, count in Counter(self._ngrams(words)).items():
+            context, char = ngram[:-1], ngram[-1]
+            following = self.counts.get(context)
+            if following is None or char not in following:
+                continue
+            remaining = following[char] - count
+            if remaining > 0:
+                following[char] = remaining
+            else:
+                del following[char]
+                count += remaining
+            if following:
+                self._stale.add(context)
+            else:
+                # No word leads into a context without successors, so it can go
+                del self.counts[context]
+                self._tables.pop(context, None)
+                self._stale.discard(context)
+            if char == self.END:
+                self.word_count -= count
+    
+    def _table(self, context: str) -> Tuple[List[str], List[int]]:
+        """Get the successors of a context and their cumulative counts."""
+        if context in self._stale or context not in self._tables:
+            chars = list(self.counts[context])
+            cumulative = []
+            total = 0
+            for char in chars:
+                total += self.counts[context][char]
+                cumulative.append(total)
+            self._tables[context] = (chars, cumulative)
+            self._stale.discard(context)
+        return self._tables[context]
+    
+    def sample(self, rng=random, max_length: int = 20) -> str:
+        """Sample one word, cut off at max_length + 1 characters."""
+        context = self.START * (self.order - 1)
+        letters = []
+        while len(letters) <= max_length:
+            chars, cumulative = self._table(context)
+            char = chars[bisect_right(cumulative, rng.random() * cumulative[-1])]
+            if char == self.END:
+                break
+            letters.append(char)
+            context = (context + char)[1:] if context else ''
+        return ''.join(letters)
 
 class WordGenerator:
-    def __init__(self):
-        """Initialize the word generator with English letter patterns."""
+    def __init__(self, seed: Optional[int] = None):
+        """Initialize the word generator with English letter patterns.
+        
+        Passing a ``seed`` gives the generator its own reproducible random
+        number generator instead of the shared ``random`` module.
+        """
+        self.rng = random.Random(seed) if seed is not None else random
+        
+        # Spelling learned from valid words, the last label generation and revision
+        # it has seen and the words it currently holds
+        self.character_model = CharacterModel()
+        self.label_generation = 0
+        self.last_revision = 0
+        self._learned_words: Set[str] = set()
+        
         # Vowels and consonants for more realistic word generation
         self.vowels = 'aeiou'
         self.consonants = 'bcdfghjklmnpqrstvwxyz'
@@ -23,13 +130,13 @@ class WordGenerator:
     
     def generate_random_word(self, min_length: int = 3, max_length: int = 8) -> str:
         """Generate a random word with English-like patterns."""
-        length = random.randint(min_length, max_length)
+        length = self.rng.randint(min_length, max_length)
         
         # Choose a pattern or create a random one
         if length <= 5:
-            pattern = random.choice(self.common_patterns[:4])  # Shorter patterns
+            pattern = self.rng.choice(self.common_patterns[:4])  # Shorter patterns
         else:
-            pattern = random.choice(self.common_patterns[4:])  # Longer patterns
+            pattern = self.rng.choice(self.common_patterns[4:])  # Longer patterns
         
         # If pattern is too long, truncate it
         if len(pattern) > length:
@@ -46,61 +153,153 @@ class WordGenerator:
         word = ""
         for char in pattern:
             if char == 'C':
-                word += random.choice(self.consonants)
+                word += self.rng.choice(self.consonants)
             elif char == 'V':
-                word += random.choice(self.vowels)
+                word += self.rng.choice(self.vowels)
         
         return word
     
     def generate_simple_random_word(self, min_length: int = 3, max_length: int = 8) -> str:
         """Generate a completely random word using all letters."""
-        length = random.randint(min_length, max_length)
-        return ''.join(random.choice(self.all_letters) for _ in range(length))
+        length = self.rng.randint(min_length, max_length)
+        return ''.join(self.rng.choice(self.all_letters) for _ in range(length))
     
     def generate_realistic_word(self, min_length: int = 3, max_length: int = 8) -> str:
         """Generate a word that follows English-like patterns more closely."""
-        length = random.randint(min_length, max_length)
+        length = self.rng.randint(min_length, max_length)
         word = ""
         
         # Start with consonant or vowel randomly
-        start_with_consonant = random.choice([True, False])
+        start_with_consonant = self.rng.choice([True, False])
         
         for i in range(length):
             if i == 0:
                 # First letter
                 if start_with_consonant:
-                    word += random.choice(self.consonants)
+                    word += self.rng.choice(self.consonants)
                 else:
-                    word += random.choice(self.vowels)
+                    word += self.rng.choice(self.vowels)
             else:
                 # Subsequent letters - alternate or repeat based on probability
                 last_char = word[-1]
                 if last_char in self.vowels:
                     # After vowel, 70% chance of consonant, 30% vowel
-                    if random.random() < 0.7:
-                        word += random.choice(self.consonants)
+                    if self.rng.random() < 0.7:
+                        word += self.rng.choice(self.consonants)
                     else:
-                        word += random.choice(self.vowels)
+                        word += self.rng.choice(self.vowels)
                 else:
                     # After consonant, 80% chance of vowel, 20% consonant
-                    if random.random() < 0.8:
-                        word += random.choice(self.vowels)
+                    if self.rng.random() < 0.8:
+                        word += self.rng.choice(self.vowels)
                     else:
-                        word += random.choice(self.consonants)
+                        word += self.rng.choice(self.consonants)
         
         return word
     
+    def learn_words(self, words: Iterable[str]):
+        """Train the learned model on more valid words."""
+        self.character_model.add_words(words)
+    
+    def learn_from_database(self, database) -> int:
+        """Train the learned model on words labeled or relabeled in the database since the last call.
+        
+        Words that became valid are added, and words that stopped being
+        valid are taken back out. Once words were deleted from the database,
+        everything learned from it is dropped and learned again.
+        """
+        generation = database.get_metadata(LABEL_GENERATION)
+        if generation != self.label_generation:
+            # Deleted words never show up as label changes
+            self.character_model.remove_words(self._learned_words)
+            self._learned_words = set()
+            self.last_revision = 0
+            self.label_generation = generation
+        added, removed = [], []
+        for revision, word, is_valid in database.iter_label_changes(self.last_revision):
+            self.last_revision = revision
+            if is_valid and word not in self._learned_words:
+                added.append(word)
+                self._learned_words.add(word)
+            elif not is_valid and word in self._learned_words:
+                removed.append(word)
+                self._learned_words.discard(word)
+        if removed:
+            self.character_model.remove_words(removed)
+        if added:
+            self.character_model.add_words(added)
+        return len(added)
+    
+    def generate_learned_word(self, min_length: int = 3, max_length: int = 8,
+                              exclude: Container[str] = (), attempts: int = 20) -> str:
+        """Generate a word spelled like the valid words learned so far.
+        
+        Words outside the length range or in ``exclude`` (such as words that
+        are already labeled) are redrawn. Falls back to generate_realistic_word
+        while nothing has been learned or no acceptable word turns up.
+        """
+        if self.character_model:
+            for _ in range(attempts):
+                word = self.character_model.sample(self.rng, max_length)
+                if min_length <= len(word) <= max_length and word not in exclude:
+                    return word
+        return self.generate_realistic_word(min_length, max_length)
+    
     def generate_multiple_words(self, count: int, method: str = 'realistic') -> List[str]:
         """Generate multiple words using the specified method."""
-        words = []
-        for _ in range(count):
+        return [word for chunk in self.iter_words(count, method) for word in chunk]
+    
+    def iter_words(self, count: int, method: str = 'realistic', min_length: int = 3, max_length: int = 8,
+                   chunk_size: int = 10000) -> Iterator[List[str]]:
+        """Generate words in lists of up to chunk_size, so large counts can be streamed."""
+        while count > 0:
+            size = min(chunk_size, count)
+            count -= size
             if method == 'pattern':
-                word = self.generate_random_word()
+                yield [self.generate_random_word(min_length, max_length) for _ in range(size)]
             elif method == 'simple':
-                word = self.generate_simple_random_word()
+                yield self._simple_words(size, min_length, max_length)
+            elif method == 'learned':
+                yield [self.generate_learned_word(min_length, max_length) for _ in range(size)]
             else:  # realistic
-                word = self.generate_realistic_word()
-            words.append(word)
+                yield self._realistic_words(size, min_length, max_length)
+    
+    def _simple_words(self, count: int, min_length: int, max_length: int) -> List[str]:
+        """Bulk version of generate_simple_random_word: one draw for all the letters."""
+        lengths = self.rng.choices(range(min_length, max_length + 1), k=count)
+        letters = ''.join(self.rng.choices(self.all_letters, k=sum(lengths)))
+        words = []
+        position = 0
+        for length in lengths:
+            words.append(letters[position:position + length])
+            position += length
+        return words
+    
+    def _realistic_words(self, count: int, min_length: int, max_length: int) -> List[str]:
+        """Bulk version of generate_realistic_word.
+        
+        The lengths, letters and vowel/consonant coin flips for every word are
+        drawn up front, then each word is assembled with a single join.
+        """
+        rng = self.rng
+        lengths = rng.choices(range(min_length, max_length + 1), k=count)
+        starts_with_consonant = rng.choices((True, False), k=count)
+        total = sum(lengths)
+        consonants = rng.choices(self.consonants, k=total)
+        vowels = rng.choices(self.vowels, k=total)
+        flips = [rng.random() for _ in range(total)]
+        
+        words = []
+        position = 0
+        for length, consonant in zip(lengths, starts_with_consonant):
+            end = position + length
+            letters = [consonants[position] if consonant else vowels[position]]
+            for i in range(position + 1, end):
+                # After a vowel, 70% chance of consonant; after a consonant, 80% chance of vowel
+                consonant = flips[i] >= 0.8 if consonant else flips[i] < 0.7
+                letters.append(consonants[i] if consonant else vowels[i])
+            words.append(''.join(letters))
+            position = end
         return words
     
     def get_word_complexity(self, word: str) -> str:
@@ -0,0 +1,125 @@
+import math
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List
+from storage import LABEL_GENERATION
+
+class WordScorer:
+    """Scores how much a word looks like the valid words rather than the invalid ones.
+    
+    Trained on the labels in the words table, a word's score is the average
+    log-likelihood ratio of its character bigrams (with start and end markers)
+    under the valid and invalid labels. Positive scores lean valid.
+    """
+    
+    START = '^'
+    END = '$'
+    
+    def __init__(self):
+        """Initialize an untrained scorer."""
+        self.valid_counts: Counter = Counter()
+        self.invalid_counts: Counter = Counter()
+        self.word_count = 0
+        # The last label generation and revision learned, and the label each learned word was counted under
+        self.label_generation = 0
+        self.last_revision = 0
+        self.labels: Dict[str, bool] = {}
+        self._weights: Dict[str, float] = None
+        self._unseen_weight = 0.0
+    
+    def __len__(self) -> int:
+        return self.word_count
+    
+    def _bigrams(self, words: Iterable[str]) -> Iterator[str]:
+        """Yield each word's padded character bigrams."""
+        for word in words:
+            padded = self.START + word + self.END
+            for i in range(len(padded) - 1):
+                yield padded[i:i + 2]
+    
+    def add_words(self, words: Iterable[str], is_valid: bool):
+        """Count the bigrams of more labeled words."""
+        words = list(words)
+        counts = self.valid_counts if is_valid else self.invalid_counts
+        counts.update(self._bigrams(words))
+        self.word_count += len(words)
+        self._weights = None
+    
+    def remove_words(self, words: Iterable[str], is_valid: bool):
+        """Stop counting the bigrams of labeled words that were added before."""
+        words = list(words)
+        counts = self.valid_counts if is_valid else self.invalid_counts
+        counts.subtract(self._bigrams(words))
+        for bigram in [bigram for bigram, count in counts.items() if count <= 0]:
+            del counts[bigram]
+        self.word_count -= len(words)
+        self._weights = None
+    
+    def learn_from_database(self, database) -> int:
+        """Train on words labeled or relabeled in the database since the last call.
+        
+        A relabeled word is moved from the examples of its old label to the
+        examples of its new one. Once words were deleted from the database,
+        everything learned from it is dropped and learned again.
+        """
+        generation = database.get_metadata(LABEL_GENERATION)
+        if generation != self.label_generation:
+            # Deleted words never show up as label changes
+            for is_valid in (True, False):
+                self.remove_words([word for word, label in self.labels.items() if label == is_valid], is_valid)
+            self.labels = {}
+            self.last_revision = 0
+            self.label_generation = generation
+        added = {True: [], False: []}
+        removed = {True: [], False: []}
+        for revision, word, is_valid in database.iter_label_changes(self.last_revision):
+            self.last_revision = revision
+            previous = self.labels.get(word)
+            if previous == is_valid:
+                continue
+            if previous is not None:
+                removed[previous].append(word)
+            added[is_valid].append(word)
+            self.labels[word] = is_valid
+        for is_valid in (True, False):
+            if removed[is_valid]:
+                self.remove_words(removed[is_valid], is_valid)
+            if added[is_valid]:
+                self.add_words(added[is_valid], is_valid)
+        return len(added[True]) + len(added[False])
+    
+    def _build_weights(self):
+        """Precompute the add-one smoothed log-likelihood ratio of every seen bigram."""
+        bigrams = self.valid_counts.keys() | self.invalid_counts.keys()
+        # One extra slot shared by all unseen bigrams
+        valid_total = sum(self.valid_counts.values()) + len(bigrams) + 1
+        invalid_total = sum(self.invalid_counts.values()) + len(bigrams) + 1
+        offset = math.log(invalid_total) - math.log(valid_total)
+        self._weights = {
+            bigram: math.log(self.valid_counts[bigram] + 1) - math.log(self.invalid_counts[bigram] + 1) + offset
+            for bigram in bigrams
+        }
+        self._unseen_weight = offset
+    
+    def score(self, word: str) -> float:
+        """Score one word."""
+        return self.score_words([word])[0]
+    
+    def score_words(self, words: Iterable[str]) -> List[float]:
+        """Score a batch of words."""
+        if self._weights is None:
+            self._build_weights()
+        weight = self._weights.get
+        unseen = self._unseen_weight
+        scores = []
+        for word in words:
+            padded = self.START + word + self.END
+            bigram_count = len(padded) - 1
+            total = sum([weight(padded[i:i + 2], unseen) for i in range(bigram_count)])
+            scores.append(total / bigram_count)
+        return scores
+    
+    def filter_plausible(self, words: Iterable[str], threshold: float = 0.0) -> List[str]:
+        """Keep the words scoring at least threshold, best first."""
+        words = list(words)
+        scored = sorted(zip(self.score_words(words), words), key=lambda pair: pair[0], reverse=True)
+        return [word for score, word in scored if score >= threshold]